@@ -0,0 +1,260 @@
+"""
+Local stand-in for the VyOS HTTP API used by the benchmark harness.
+
+Serves /retrieve, /show, /configure, /config-file and /graphql with
+configurable latency and payload size. Configure set and delete operations
+change the served config. Run it directly:
+
+    python benchmarks/mock_vyos.py --port 18443 --latency 50 --interfaces 200 --routes 5000
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import sys
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+# Writes are applied with the backend's own tree helpers
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from config_tree import apply_delete, apply_set
+
+
+def build_config(interfaces: int, rules: int) -> Dict[str, Any]:
+    """
+    Build a synthetic running configuration tree.
+
+    Args:
+        interfaces: Number of ethernet interfaces
+        rules: Number of firewall rules
+
+    Returns:
+        The configuration tree, shaped like VyOS showConfig output
+    """
+    ethernet = {
+        f"eth{i}": {
+            "address": [f"10.{i // 256}.{i % 256}.1/24"],
+            "description": f"Interface {i}",
+            "hw-id": f"00:50:56:{i // 65536 % 256:02x}:{i // 256 % 256:02x}:{i % 256:02x}",
+        }
+        for i in range(interfaces)
+    }
+    firewall_rules = {
+        str(i): {
+            "action": "accept" if i % 2 else "drop",
+            "destination": {"port": str(1024 + i)},
+            "protocol": "tcp",
+        }
+        for i in range(1, rules + 1)
+    }
+    return {
+        "interfaces": {"ethernet": ethernet, "loopback": {"lo": {}}},
+        "firewall": {"ipv4": {"name": {"WAN_IN": {"default-action": "drop", "rule": firewall_rules}}}},
+        "nat": {"source": {"rule": {"100": {"outbound-interface": {"name": "eth0"}, "translation": {"address": "masquerade"}}}}},
+        "protocols": {"static": {"route": {"0.0.0.0/0": {"next-hop": {"10.0.0.254": {}}}}}},
+        "service": {
+            "dhcp-server": {"shared-network-name": {"LAN": {"subnet": {"192.168.1.0/24": {"range": {"0": {"start": "192.168.1.100", "stop": "192.168.1.200"}}}}}}},
+            "https": {"api": {"keys": {"id": {"bench": {"key": "bench"}}}}},
+            "ssh": {"port": "22"},
+        },
+        "system": {"host-name": "vyos-bench", "ntp": {"server": {"time1.vyos.net": {}}}},
+    }
+
+
+def build_routes(count: int) -> str:
+    """
+    Build `show ip route vrf all json` output in the FRR format.
+
+    Args:
+        count: Number of routes
+
+    Returns:
+        The routing table as a JSON string
+    """
+    routes = {}
+    for i in range(count):
+        prefix = f"{10 + i // 65536 % 200}.{i // 256 % 256}.{i % 256}.0/24"
+        routes[prefix] = [{
+            "prefix": prefix,
+            "prefixLen": 24,
+            "protocol": "bgp",
+            "vrfName": "default",
+            "selected": True,
+            "installed": True,
+            "distance": 20,
+            "metric": 0,
+            "uptime": "1d02h03m",
+            "nexthops": [{"ip": "10.0.0.254", "interfaceName": "eth0", "active": True}],
+        }]
+    return json.dumps({"default": routes})
+
+
+def build_leases(count: int) -> str:
+    """
+    Build `show dhcp server leases` table output.
+
+    Args:
+        count: Number of leases
+
+    Returns:
+        The leases table as text
+    """
+    lines = [
+        "IP Address     MAC address        State    Lease start          Lease expiration     Remaining    Pool    Hostname    Origin",
+        "-------------  -----------------  -------  -------------------  -------------------  -----------  ------  ----------  --------",
+    ]
+    for i in range(count):
+        lines.append(
+            f"192.168.1.{100 + i % 100}  00:11:22:33:{i // 256 % 256:02x}:{i % 256:02x}  active   "
+            f"2025/01/01 00:00:00  2025/01/02 00:00:00  23:59:59     LAN     host{i}       local"
+        )
+    return "\n".join(lines)
+
+
+class MockVyOS:
+    """Mock VyOS HTTP API with configurable latency and payload sizes."""
+
+    def __init__(self, latency: float, jitter: float, serial: bool,
+                 interfaces: int, rules: int, routes: int, leases: int):
+        """
+        Initialize the mock API.
+
+        Args:
+            latency: Base response latency in seconds
+            jitter: Random extra latency in seconds, up to this value
+            serial: Handle one request at a time, like the single-threaded VyOS API
+            interfaces: Number of interfaces in the generated config
+            rules: Number of firewall rules in the generated config
+            routes: Number of routes in the routing table
+            leases: Number of DHCP leases
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = asyncio.Lock() if serial else None
+        self.config = build_config(interfaces, rules)
+        self.routes = build_routes(routes)
+        self.leases = build_leases(leases)
+        self.counts: Dict[str, int] = {}
+
+    async def _delay(self) -> None:
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+    async def _serve(self, handler, request: web.Request) -> web.Response:
+        self.counts[request.path] = self.counts.get(request.path, 0) + 1
+        if self.lock is None:
+            await self._delay()
+            return await handler(request)
+        async with self.lock:
+            await self._delay()
+            return await handler(request)
+
+    @staticmethod
+    async def _payload(request: web.Request) -> Any:
+        form = await request.post()
+        # VyManager sends the data field twice (None, then the JSON); the VyOS API uses the last one
+        return json.loads(form.getall("data")[-1])
+
+    def _config_at(self, path: List[str]) -> Any:
+        node = self.config
+        for part in path:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        if not isinstance(node, dict):
+            return {path[-1]: node}
+        return node
+
+    async def retrieve(self, request: web.Request) -> web.Response:
+        data = await self._payload(request)
+        path = data.get("path", [])
+        node = self._config_at(path)
+        if data.get("op") == "exists":
+            return web.json_response({"success": True, "data": node is not None, "error": None})
+        if node is None:
+            return web.json_response(
+                {"success": False, "error": "Configuration under specified path is empty", "data": None},
+                status=400,
+            )
+        return web.json_response({"success": True, "data": node, "error": None})
+
+    async def show(self, request: web.Request) -> web.Response:
+        data = await self._payload(request)
+        command = " ".join(data.get("path", []))
+        if command.startswith("ip route"):
+            output = self.routes
+        elif command.startswith("dhcp server leases"):
+            output = self.leases
+        else:
+            output = f"Output of 'show {command}'"
+        return web.json_response({"success": True, "data": output, "error": None})
+
+    async def configure(self, request: web.Request) -> web.Response:
+        data = await self._payload(request)
+        # A single operation, or a list of them for a batch
+        for operation in data if isinstance(data, list) else [data]:
+            path = [str(part) for part in operation.get("path") or []]
+            if operation.get("op") == "set":
+                apply_set(self.config, path)
+            elif operation.get("op") == "delete":
+                apply_delete(self.config, path)
+        return web.json_response({"success": True, "data": None, "error": None})
+
+    async def config_file(self, request: web.Request) -> web.Response:
+        await self._payload(request)
+        return web.json_response({"success": True, "data": None, "error": None})
+
+    async def graphql(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"data": {"result": {"success": True, "errors": None, "data": {"result": {}}}}})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"counts": self.counts})
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.counts = {}
+        return web.json_response({"success": True})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        for path, handler in (
+            ("/retrieve", self.retrieve),
+            ("/show", self.show),
+            ("/configure", self.configure),
+            ("/config-file", self.config_file),
+            ("/graphql", self.graphql),
+        ):
+            app.router.add_post(path, lambda request, handler=handler: self._serve(handler, request))
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_post("/_stats/reset", self.reset_stats)
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock VyOS HTTP API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18443)
+    parser.add_argument("--latency", type=float, default=50, help="Base latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=10, help="Random extra latency in milliseconds")
+    parser.add_argument("--serial", action="store_true", help="Serve one request at a time")
+    parser.add_argument("--interfaces", type=int, default=50)
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--routes", type=int, default=1000)
+    parser.add_argument("--leases", type=int, default=200)
+    args = parser.parse_args()
+
+    mock = MockVyOS(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        serial=args.serial,
+        interfaces=args.interfaces,
+        rules=args.rules,
+        routes=args.routes,
+        leases=args.leases,
+    )
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
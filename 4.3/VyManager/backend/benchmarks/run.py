@@ -0,0 +1,303 @@
+"""
+End-to-end benchmark for the VyManager backend.
+
+Starts the mock VyOS API (benchmarks/mock_vyos.py) in a subprocess, points
+the FastAPI app at it and drives realistic traffic through the app
+in-process. Reports p50/p95/p99 latency, throughput and RSS per scenario,
+plus how many upstream router calls each scenario caused.
+
+Run from the backend directory:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --scenarios home,routingtable --requests 500 --concurrency 20
+    python benchmarks/run.py --latency 100 --serial --routes 50000 --json results.json
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+MOCK_SCRIPT = pathlib.Path(__file__).resolve().parent / "mock_vyos.py"
+
+# Pages of the frontend home view load these config subtrees together
+HOME_PAGE_PATHS = [
+    "/api/config/",
+    "/api/config/interfaces",
+    "/api/config/system",
+    "/api/config/service",
+    "/api/config/firewall",
+    "/api/config/nat",
+    "/api/config/protocols",
+    "/api/check-unsaved-changes",
+]
+
+# A new WireGuard peer is created with this many individual set calls
+WIREGUARD_PEER_FIELDS = ["public-key", "allowed-ips", "endpoint", "port", "persistent-keepalive", "description"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Get a percentile of a list of samples using the nearest-rank method.
+
+    Args:
+        samples: Sorted samples
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile value, or 0 for no samples
+    """
+    if not samples:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(samples))))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def current_rss_mb() -> float:
+    """Get the current resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Get the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    """
+    Start the mock VyOS API and wait until it accepts connections.
+
+    Args:
+        args: Parsed command line arguments
+        port: Port to listen on
+
+    Returns:
+        The mock server process
+    """
+    command = [
+        sys.executable, str(MOCK_SCRIPT),
+        "--port", str(port),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--interfaces", str(args.interfaces),
+        "--rules", str(args.rules),
+        "--routes", str(args.routes),
+        "--leases", str(args.leases),
+    ]
+    if args.serial:
+        command.append("--serial")
+    process = subprocess.Popen(command)
+
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock VyOS API did not start")
+
+
+async def run_scenario(
+    name: str,
+    request_fn: Callable[[int], Awaitable[List[Any]]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """
+    Run one scenario with a fixed number of workers.
+
+    Args:
+        name: Scenario name
+        request_fn: Coroutine function performing iteration i and returning its responses
+        total: Number of iterations
+        concurrency: Number of concurrent workers
+
+    Returns:
+        Scenario results
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            responses = await request_fn(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += sum(1 for response in responses if response.status_code >= 400)
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        "scenario": name,
+        "iterations": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "rss_mb": current_rss_mb(),
+        "rss_delta_mb": current_rss_mb() - rss_before,
+    }
+
+
+def build_scenarios(http) -> Dict[str, Callable[[int], Awaitable[List[Any]]]]:
+    """
+    Build the traffic scenarios.
+
+    Args:
+        http: httpx.AsyncClient bound to the app
+
+    Returns:
+        Mapping of scenario name to a coroutine function for one iteration
+    """
+    async def home(i: int) -> List[Any]:
+        return await asyncio.gather(*(http.get(path) for path in HOME_PAGE_PATHS))
+
+    async def routingtable(i: int) -> List[Any]:
+        return [await http.get("/api/routingtable")]
+
+    async def dhcp_leases(i: int) -> List[Any]:
+        return [await http.get("/api/dhcp/leases")]
+
+    async def configure_burst(i: int) -> List[Any]:
+        base = f"/api/configure/set/interfaces/wireguard/wg0/peer/bench{i}"
+        return await asyncio.gather(*(
+            http.post(f"{base}/{field}", params={"value": f"value{i}"})
+            for field in WIREGUARD_PEER_FIELDS
+        ))
+
+    return {
+        "home": home,
+        "routingtable": routingtable,
+        "dhcp_leases": dhcp_leases,
+        "configure_burst": configure_burst,
+    }
+
+
+async def benchmark(args: argparse.Namespace, port: int) -> List[Dict[str, Any]]:
+    """
+    Run the selected scenarios against the app.
+
+    Args:
+        args: Parsed command line arguments
+        port: Port of the mock VyOS API
+
+    Returns:
+        Results for each scenario
+    """
+    os.environ.update({
+        "VYOS_HOST": f"127.0.0.1:{port}",
+        "VYOS_API_KEY": "bench",
+        "VYOS_HTTPS": "false",
+        "ENVIRONMENT": "production",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "warning"),
+        "BACKEND_LOG": "",
+    })
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import httpx
+    import main
+
+    mock_stats_url = f"http://127.0.0.1:{port}/_stats"
+    results = []
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://vymanager", timeout=120) as http, \
+                httpx.AsyncClient(timeout=10) as mock:
+            selected = build_scenarios(http)
+            for name in args.scenarios:
+                if name not in selected:
+                    raise SystemExit(f"Unknown scenario: {name} (choose from {', '.join(selected)})")
+                if args.cold:
+                    main.cache.clear()
+                await mock.post(f"{mock_stats_url}/reset")
+
+                result = await run_scenario(name, selected[name], args.requests, args.concurrency)
+                result["upstream_calls"] = sum((await mock.get(mock_stats_url)).json()["counts"].values())
+                results.append(result)
+
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    """Print results as a table."""
+    header = f"{'scenario':<16} {'iter':>6} {'conc':>5} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'upstream':>9} {'rss MiB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<16} {r['iterations']:>6} {r['concurrency']:>5} {r['errors']:>5} "
+            f"{r['throughput_rps']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['upstream_calls']:>9} {r['rss_mb']:>8.1f}"
+        )
+    print(f"\nPeak RSS: {peak_rss_mb():.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="VyManager backend benchmark")
+    parser.add_argument("--scenarios", default="home,routingtable,dhcp_leases,configure_burst",
+                        help="Comma-separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=200, help="Iterations per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent workers per scenario")
+    parser.add_argument("--cold", action="store_true", help="Clear the backend cache before each scenario")
+    parser.add_argument("--latency", type=float, default=50, help="Mock router latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=10, help="Mock router latency jitter in milliseconds")
+    parser.add_argument("--serial", action="store_true", help="Mock router serves one request at a time")
+    parser.add_argument("--interfaces", type=int, default=50, help="Interfaces in the mock config")
+    parser.add_argument("--rules", type=int, default=200, help="Firewall rules in the mock config")
+    parser.add_argument("--routes", type=int, default=1000, help="Routes in the mock routing table")
+    parser.add_argument("--leases", type=int, default=200, help="Leases in the mock DHCP server")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    port = free_port()
+    mock_process = start_mock(args, port)
+    try:
+        results = asyncio.run(benchmark(args, port))
+    finally:
+        mock_process.terminate()
+        mock_process.wait(timeout=10)
+
+    print_results(results)
+    if args.json:
+        import json
+        with open(args.json, "w") as output:
+            json.dump({"args": vars(args), "peak_rss_mb": peak_rss_mb(), "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
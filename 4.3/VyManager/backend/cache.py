@@ -1,14 +1,280 @@
+import sys
 import time
+import hashlib
+import bisect
+import os
+import struct
 import json
+import tempfile
 import functools
-from typing import Dict, Any, Optional, Callable, Tuple, Union, TypeVar, cast
+import logging
+from typing import Dict, Any, List, Optional, Callable, Tuple, Union, TypeVar, cast
 from datetime import datetime, timedelta
 
+from starlette.datastructures import Headers, MutableHeaders
+
+import codec
+from codec import EncodedJSONResponse
+from cache_backend import CacheBackend, CacheEntry, MemoryBackend, SQLiteBackend, KEY_SEPARATOR, key_prefix
+from utils import SingleFlight
+
 T = TypeVar('T')
 
+logger = logging.getLogger(__name__)
+
+# Default bounds for the cache
+DEFAULT_MAX_ITEMS = 2000
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+# Seconds a cache fill may take before it is cancelled and its waiters fail
+DEFAULT_FILL_TIMEOUT = 120.0
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Snapshot file layout: header, then one record per entry. Each record is
+# followed by the key, media type, ETag and body, in that order.
+SNAPSHOT_MAGIC = b"VMCS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sBI")      # magic, version, entry count
+SNAPSHOT_RECORD = struct.Struct("<ddHHBBI")   # expiry, stale_until, status, key len, media type len, ETag len, body len
+
+# Rough fixed cost of an entry (key, entry object, dict slot) on top of its value
+ENTRY_OVERHEAD = 200
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory used by a cached value.
+    
+    Args:
+        value: The cached value
+        
+    Returns:
+        Approximate size in bytes
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    body = getattr(value, "body", None)
+    if isinstance(body, (bytes, bytearray)):
+        # Response objects are dominated by their rendered body
+        return len(body)
+    try:
+        # Encoded JSON length tracks the size of nested dicts and lists well enough
+        return len(codec.dumps(value))
+    except (TypeError, ValueError, OverflowError):
+        return sys.getsizeof(value)
+
+
+class LatencyHistogram:
+    """Latency histogram with fixed millisecond buckets."""
+    __slots__ = ("counts", "count", "total_ms")
+    
+    def __init__(self):
+        # One count per bucket plus one for values above the last bound
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+    
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Get the upper bound of the bucket holding a percentile.
+        
+        Args:
+            pct: Percentile between 0 and 100
+            
+        Returns:
+            Bucket bound in milliseconds, infinity above the last bucket, or None without samples
+        """
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return float("inf")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        p95 = self.percentile(95)
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            # JSON has no infinity, so the open-ended bucket is reported as null
+            "p95_ms": p95 if p95 != float("inf") else None,
+            "buckets": buckets
+        }
+
+
+class PrefixMetrics:
+    """Cache counters and latencies for the keys under one prefix."""
+    __slots__ = ("hits", "misses", "stale_hits", "hit_latency", "miss_latency", "fetch_latency")
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        # Time to answer a call to a cached function, split by outcome
+        self.hit_latency = LatencyHistogram()
+        self.miss_latency = LatencyHistogram()
+        # Time spent in the wrapped function itself when filling the cache
+        self.fetch_latency = LatencyHistogram()
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Compute a strong ETag from a response body.
+    
+    Args:
+        body: Encoded response body
+        
+    Returns:
+        Quoted ETag value
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class CachedResponse:
+    """
+    An encoded response stored in the cache, ready to be sent as it is.
+    
+    A hit only wraps the stored bytes in a new response object; nothing is
+    decoded, re-encoded or copied.
+    """
+    __slots__ = ("body", "status_code", "media_type", "etag")
+    
+    def __init__(self, body: bytes, status_code: int = 200, media_type: str = "application/json", etag: Optional[str] = None):
+        self.body = body
+        self.status_code = status_code
+        self.media_type = media_type
+        self.etag = etag or make_etag(body)
+    
+    @classmethod
+    def from_response(cls, response: Any) -> Optional["CachedResponse"]:
+        """
+        Capture a rendered response.
+        
+        Args:
+            response: A Starlette response
+            
+        Returns:
+            The stored form, or None if the response has no rendered body (e.g. streaming)
+        """
+        body = getattr(response, "body", None)
+        if not isinstance(body, (bytes, bytearray)):
+            return None
+        return cls(bytes(body), response.status_code, response.media_type or "application/json")
+    
+    def to_response(self) -> EncodedJSONResponse:
+        return EncodedJSONResponse(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.media_type,
+            headers={"ETag": self.etag},
+        )
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag using weak comparison.
+    
+    Args:
+        if_none_match: Header value, a list of ETags or "*"
+        etag: ETag of the current response
+        
+    Returns:
+        True if the client's copy is current
+    """
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI middleware answering conditional GETs for responses that carry an ETag.
+    
+    Cached responses get their ETag when they are stored, so a request whose
+    If-None-Match matches gets a 304 and the stored body is never sent.
+    Matching responses are also marked "Cache-Control: no-cache" so browsers
+    keep them and revalidate on every poll.
+    """
+    
+    def __init__(self, app, paths: Tuple[str, ...] = (), cache_control: str = "no-cache"):
+        """
+        Initialize the middleware.
+        
+        Args:
+            app: The ASGI application
+            paths: Path prefixes to handle (default: all paths)
+            cache_control: Cache-Control value for responses with an ETag
+        """
+        self.app = app
+        self.paths = tuple(path.rstrip("/") for path in paths)
+        self.cache_control = cache_control
+    
+    def _handles(self, path: str) -> bool:
+        if not self.paths:
+            return True
+        return any(path == prefix or path.startswith(prefix + "/") for prefix in self.paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not self._handles(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        not_modified = False
+        
+        async def send_conditional(message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and message["status"] == 200:
+                    headers.setdefault("cache-control", self.cache_control)
+                    if if_none_match and etag_matches(if_none_match, etag):
+                        not_modified = True
+                        message["status"] = 304
+                        for name in ("content-length", "content-type", "content-encoding"):
+                            if name in headers:
+                                del headers[name]
+                await send(message)
+                return
+            
+            if not_modified:
+                # Drop the body, ending the response with the last chunk
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            await send(message)
+        
+        await self.app(scope, receive, send_conditional)
+
+
 class Cache:
     """
-    A simple in-memory cache with TTL support.
+    A cache with TTL support on top of a pluggable storage backend.
+    
+    The default backend is an in-memory LRU bounded by an item count and an
+    approximate byte budget. A shared backend lets several worker processes
+    use one cache and see each other's invalidations.
     """
     _instance = None
     
@@ -19,11 +285,279 @@ class Cache:
         return cls._instance
     
     def _init(self):
-        self._cache: Dict[str, Tuple[Any, float]] = {}
+        self.backend: CacheBackend = MemoryBackend()
+        self.backend.configure(max_items=DEFAULT_MAX_ITEMS, max_bytes=DEFAULT_MAX_BYTES)
+        # Concurrent misses for the same key share one fill
+        self.fills = SingleFlight()
+        self._listeners: List[Callable[[str], None]] = []
+        self._metrics: Dict[str, PrefixMetrics] = {}
         self._hit_count = 0
         self._miss_count = 0
+        self._stale_hit_count = 0
+        self._expiration_count = 0
         self._creation_time = time.time()
     
+    @property
+    def max_items(self) -> int:
+        return self.backend.max_items
+    
+    @property
+    def max_bytes(self) -> int:
+        return self.backend.max_bytes
+    
+    def use_backend(self, backend: CacheBackend) -> None:
+        """
+        Switch to another storage backend, keeping the current bounds.
+        
+        Entries in the previous backend are dropped.
+        
+        Args:
+            backend: The new backend
+        """
+        backend.configure(max_items=self.backend.max_items, max_bytes=self.backend.max_bytes)
+        self.backend.close()
+        self.backend = backend
+    
+    def configure(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """
+        Set the cache bounds, evicting entries if the cache is now over them.
+        
+        Args:
+            max_items: Maximum number of entries (0 for no limit)
+            max_bytes: Approximate maximum size of all values in bytes (0 for no limit)
+        """
+        self.backend.configure(max_items=max_items, max_bytes=max_bytes)
+    
+    def add_invalidation_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        Register a function called with each invalidated key prefix.
+        
+        Listeners are called for invalidations in this process and, with a
+        shared backend, for those made by other processes.
+        
+        Args:
+            listener: Function taking the invalidated prefix ("" for everything)
+        """
+        self._listeners.append(listener)
+    
+    def _invalidated(self, prefix: str, publish: bool = True) -> None:
+        if publish:
+            self.backend.publish_invalidation(prefix)
+        for listener in self._listeners:
+            try:
+                listener(prefix)
+            except Exception as e:
+                logger.warning("Cache invalidation listener failed for %r: %s", prefix, e)
+    
+    def poll_invalidations(self) -> int:
+        """
+        Deliver invalidations made by other processes to the listeners.
+        
+        Returns:
+            Number of invalidations received
+        """
+        prefixes = self.backend.poll_invalidations()
+        for prefix in prefixes:
+            self._invalidated(prefix, publish=False)
+        return len(prefixes)
+    
+    async def watch_invalidations(self, interval: float) -> None:
+        """
+        Poll for invalidations made by other processes until cancelled.
+        
+        Args:
+            interval: Seconds between polls
+        """
+        while True:
+            try:
+                self.poll_invalidations()
+            except Exception as e:
+                logger.warning("Failed to poll cache invalidations: %s", e)
+            await asyncio.sleep(interval)
+    
+    def save_snapshot(self, path: str) -> int:
+        """
+        Write the cached responses to a snapshot file.
+        
+        Only encoded responses are saved. The file is written to a uniquely
+        named file next to the target and renamed into place, so a crash or
+        a concurrent save never leaves a partial snapshot behind.
+        
+        Args:
+            path: Snapshot file path
+            
+        Returns:
+            Number of entries written
+        """
+        if self.backend.shared:
+            logger.info("Not writing a cache snapshot: the shared cache backend is already persistent")
+            return 0
+        
+        now = time.time()
+        records = []
+        for key, entry in self.backend.items():
+            value = entry.value
+            if not isinstance(value, CachedResponse) or entry.stale_until < now:
+                continue
+            key_bytes = key.encode("utf-8")
+            media_type = value.media_type.encode("utf-8")
+            etag = value.etag.encode("ascii")
+            records.append(b"".join((
+                SNAPSHOT_RECORD.pack(
+                    entry.expiry, entry.stale_until, value.status_code,
+                    len(key_bytes), len(media_type), len(etag), len(value.body)
+                ),
+                key_bytes, media_type, etag, value.body
+            )))
+        
+        # A unique name, so workers saving at the same time never share a temporary file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as snapshot:
+                snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(records)))
+                snapshot.writelines(records)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info("Saved %d cache entries to %s", len(records), path)
+        return len(records)
+    
+    def load_snapshot(self, path: str) -> int:
+        """
+        Restore cached responses from a snapshot file.
+        
+        Entries keep their original expiry, so ones that expired while the
+        application was down are skipped. Restored entries are marked for
+        revalidation.
+        
+        Args:
+            path: Snapshot file path
+            
+        Returns:
+            Number of entries restored
+        """
+        if not os.path.exists(path):
+            return 0
+        
+        with open(path, "rb") as snapshot:
+            data = memoryview(snapshot.read())
+        try:
+            magic, version, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        except struct.error:
+            logger.warning("Ignoring truncated cache snapshot %s", path)
+            return 0
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            logger.warning("Ignoring cache snapshot %s with unknown format", path)
+            return 0
+        
+        now = time.time()
+        offset = SNAPSHOT_HEADER.size
+        loaded = 0
+        try:
+            for _ in range(count):
+                expiry, stale_until, status, key_len, media_len, etag_len, body_len = SNAPSHOT_RECORD.unpack_from(data, offset)
+                offset += SNAPSHOT_RECORD.size
+                key = bytes(data[offset:offset + key_len]).decode("utf-8")
+                offset += key_len
+                media_type = bytes(data[offset:offset + media_len]).decode("utf-8")
+                offset += media_len
+                etag = bytes(data[offset:offset + etag_len]).decode("ascii")
+                offset += etag_len
+                body = bytes(data[offset:offset + body_len])
+                offset += body_len
+                if len(body) != body_len:
+                    raise struct.error("record extends past the end of the file")
+                
+                if stale_until < now:
+                    continue
+                value = CachedResponse(body, status, media_type, etag)
+                size = body_len + ENTRY_OVERHEAD + len(key)
+                self.backend.set(key, CacheEntry(value, expiry, size, stale_until, revalidate=True))
+                loaded += 1
+        except (struct.error, UnicodeDecodeError) as e:
+            logger.warning("Cache snapshot %s is damaged, kept %d entries read before the damage: %s", path, loaded, e)
+        
+        logger.info("Loaded %d cache entries from %s", loaded, path)
+        return loaded
+    
+    def sweep(self) -> int:
+        """
+        Remove entries that are past their expiry and stale window.
+        
+        Returns:
+            Number of entries removed
+        """
+        removed = self.backend.sweep(time.time())
+        self._expiration_count += removed
+        if removed:
+            logger.debug("Swept %d expired cache entries", removed)
+        return removed
+    
+    async def run_sweeper(self, interval: float) -> None:
+        """
+        Sweep expired entries periodically until cancelled.
+        
+        Args:
+            interval: Seconds between sweeps
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning("Cache sweep failed: %s", e)
+    
+    def get_state(self, name: str, default: Any = None) -> Any:
+        """
+        Get a piece of state shared by all processes using the backend.
+        
+        Args:
+            name: State name
+            default: Value returned when the state was never set
+            
+        Returns:
+            The state value
+        """
+        return self.backend.get_state(name, default)
+    
+    def set_state(self, name: str, value: Any) -> None:
+        """
+        Set a piece of state shared by all processes using the backend.
+        
+        Args:
+            name: State name
+            value: JSON-serializable value
+        """
+        self.backend.set_state(name, value)
+    
+    def delete_state(self, name: str) -> None:
+        """
+        Remove a piece of shared state, so reads get their default again.
+        
+        Args:
+            name: State name
+        """
+        self.backend.delete_state(name)
+    
+    def metrics(self, key: str) -> PrefixMetrics:
+        """
+        Get the metrics for the prefix of a key.
+        
+        Args:
+            key: Cache key or prefix
+            
+        Returns:
+            Metrics of the key's first segment
+        """
+        prefix = key_prefix(key)
+        metrics = self._metrics.get(prefix)
+        if metrics is None:
+            metrics = self._metrics[prefix] = PrefixMetrics()
+        return metrics
+    
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value from the cache.
@@ -34,22 +568,50 @@ class Cache:
         Returns:
             Cached value or None if not found or expired
         """
-        if key not in self._cache:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+    
+    def get_entry(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """
+        Get a cache entry, optionally including expired entries still within their stale window.
+        
+        Args:
+            key: Cache key
+            allow_stale: Return expired entries that have not passed stale_until
+            
+        Returns:
+            The entry, or None if not found or expired
+        """
+        metrics = self.metrics(key)
+        entry = self.backend.get(key)
+        if entry is None:
             self._miss_count += 1
+            metrics.misses += 1
             return None
         
-        value, expiry = self._cache[key]
-        
         # Check if the value has expired
-        if expiry < time.time():
-            self._miss_count += 1
-            del self._cache[key]
-            return None
+        now = time.time()
+        if not entry.is_fresh(now):
+            if entry.stale_until < now:
+                self._expiration_count += 1
+                self.backend.delete(key)
+                self._miss_count += 1
+                metrics.misses += 1
+                return None
+            if not allow_stale:
+                self._miss_count += 1
+                metrics.misses += 1
+                return None
+            self._stale_hit_count += 1
+            metrics.stale_hits += 1
+        else:
+            self._hit_count += 1
+            metrics.hits += 1
         
-        self._hit_count += 1
-        return value
+        self.backend.touch(key)
+        return entry
     
-    def set(self, key: str, value: Any, ttl: int = 60) -> None:
+    def set(self, key: str, value: Any, ttl: int = 60, size: Optional[int] = None, stale_ttl: int = 0) -> None:
         """
         Set a value in the cache.
         
@@ -57,9 +619,21 @@ class Cache:
             key: Cache key
             value: Value to cache
             ttl: Time to live in seconds (default: 60)
+            size: Size of the value in bytes, if already known (default: estimated)
+            stale_ttl: Seconds to keep the value after it expires, for stale serving (default: 0)
         """
+        if size is None:
+            size = estimate_size(value)
+        size += ENTRY_OVERHEAD + len(key)
+        
+        # A value bigger than the whole budget would only flush everything else
+        if self.max_bytes and size > self.max_bytes:
+            self.backend.delete(key)
+            logger.debug("Not caching %s: %d bytes exceeds the cache budget", key, size)
+            return
+        
         expiry = time.time() + ttl
-        self._cache[key] = (value, expiry)
+        self.backend.set(key, CacheEntry(value, expiry, size, expiry + stale_ttl))
     
     def delete(self, key: str) -> bool:
         """
@@ -71,29 +645,32 @@ class Cache:
         Returns:
             True if the key was deleted, False otherwise
         """
-        if key in self._cache:
-            del self._cache[key]
-            return True
-        return False
+        deleted = self.backend.delete(key)
+        self._invalidated(key)
+        return deleted
     
     def clear(self) -> None:
         """Clear all cached values."""
-        self._cache.clear()
+        self.backend.clear()
+        self._invalidated("")
     
     def delete_pattern(self, pattern: str) -> int:
         """
-        Delete all keys matching a pattern.
+        Delete all keys under a key prefix.
+        
+        The pattern is matched by whole ':'-separated segments: "config"
+        matches "config" and "config:..." but not "dynamic:showConfig" or
+        "configx".
         
         Args:
-            pattern: Pattern to match
+            pattern: Key prefix to match
             
         Returns:
             Number of keys deleted
         """
-        keys_to_delete = [k for k in self._cache.keys() if pattern in k]
-        for key in keys_to_delete:
-            del self._cache[key]
-        return len(keys_to_delete)
+        count = self.backend.delete_prefix(pattern)
+        self._invalidated(pattern)
+        return count
     
     def stats(self) -> Dict[str, Any]:
         """
@@ -104,71 +681,217 @@ class Cache:
         """
         total_requests = self._hit_count + self._miss_count
         hit_rate = self._hit_count / total_requests if total_requests > 0 else 0
+        items, size = self.backend.count()
+        expired_items = self.backend.count_expired(time.time())
+        usage = self.backend.usage_by_prefix()
+        
+        prefixes = {}
+        for prefix in sorted(set(self._metrics) | set(usage)):
+            metrics = self._metrics.get(prefix) or PrefixMetrics()
+            prefix_items, prefix_bytes = usage.get(prefix, (0, 0))
+            lookups = metrics.hits + metrics.misses
+            prefixes[prefix] = {
+                "items": prefix_items,
+                "bytes": prefix_bytes,
+                "hits": metrics.hits,
+                "misses": metrics.misses,
+                "stale_hits": metrics.stale_hits,
+                "hit_rate": metrics.hits / lookups if lookups else 0,
+                "evictions": self.backend.evictions_by_prefix.get(prefix, 0),
+                "hit_latency": metrics.hit_latency.to_dict(),
+                "miss_latency": metrics.miss_latency.to_dict(),
+                "fetch_latency": metrics.fetch_latency.to_dict()
+            }
         
         return {
-            "items": len(self._cache),
+            "backend": type(self.backend).__name__,
+            "shared": self.backend.shared,
+            "items": items,
+            "live_items": items - expired_items,
+            "expired_items": expired_items,
+            "bytes": size,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
             "hits": self._hit_count,
             "misses": self._miss_count,
             "hit_rate": hit_rate,
+            "stale_hits": self._stale_hit_count,
+            "evictions": self.backend.evictions,
+            "busy": self.backend.busy,
+            "expirations": self._expiration_count,
+            "fills": {
+                "started": self.fills.started,
+                "coalesced": self.fills.coalesced,
+                "in_flight": self.fills.in_flight()
+            },
+            "prefixes": prefixes,
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
             "uptime": time.time() - self._creation_time
         }
 
 # Create a singleton cache instance
 cache = Cache()
 
-def cached(ttl: int = 60, key_prefix: str = "") -> Callable[[Callable[..., T]], Callable[..., T]]:
+def _build_key(
+    func: Callable[..., Any],
+    key_prefix: str,
+    key_func: Optional[Callable[..., str]],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> str:
+    """
+    Build the cache key for a decorated function call.
+    
+    Args:
+        func: The decorated function
+        key_prefix: Prefix for the cache key
+        key_func: Optional function returning the rest of the key from the call arguments
+        args: Positional arguments of the call
+        kwargs: Keyword arguments of the call
+        
+    Returns:
+        The cache key
+    """
+    key_parts = [key_prefix or func.__name__]
+    
+    if key_func is not None:
+        suffix = key_func(*args, **kwargs)
+        if suffix:
+            key_parts.append(suffix)
+        return KEY_SEPARATOR.join(key_parts)
+    
+    # Add positional arguments to the key
+    if args:
+        key_parts.append("_".join(str(arg) for arg in args))
+    
+    # Add keyword arguments to the key (sorted to ensure consistent order)
+    if kwargs:
+        key_parts.append("_".join(f"{k}={v}" for k, v in sorted(kwargs.items())))
+    
+    return KEY_SEPARATOR.join(key_parts)
+
+def _unwrap(value: Any) -> Any:
+    """Turn a stored value back into what the decorated function returns."""
+    if isinstance(value, CachedResponse):
+        return value.to_response()
+    return value
+
+def _is_error_result(result: Any) -> bool:
+    """Check whether a decorated endpoint returned a server error response."""
+    return getattr(result, "status_code", 200) >= 500
+
+def cached(
+    ttl: int = 60,
+    key_prefix: str = "",
+    key_func: Optional[Callable[..., str]] = None,
+    stale_ttl: int = 0,
+    stale_if_error: int = 0,
+    fill_timeout: Optional[float] = DEFAULT_FILL_TIMEOUT,
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
     """
     Decorator for caching function results.
     
+    With stale_ttl, an expired value is returned immediately for that many
+    seconds after expiry while a single background task refreshes it. With
+    stale_if_error, an expired value is returned for that many seconds after
+    expiry when refreshing it raises or returns a 5xx response. Both only
+    apply to async functions.
+    
+    Concurrent misses for the same key of an async function share one call:
+    the first caller computes and caches the value and the others await it.
+    Returned responses are cached as their encoded body with an ETag, and
+    every hit is served from those bytes.
+    
     Args:
         ttl: Time to live in seconds (default: 60)
         key_prefix: Prefix for the cache key (default: "")
+        key_func: Function called with the same arguments as the decorated
+            function that returns the rest of the key, e.g. "interfaces:ethernet"
+            (default: all arguments joined together)
+        stale_ttl: Seconds after expiry to serve the stale value while refreshing (default: 0)
+        stale_if_error: Seconds after expiry to serve the stale value when refreshing fails (default: 0)
+        fill_timeout: Seconds a shared call may take before it is cancelled (default: 120, None for no limit)
         
     Returns:
         Decorated function
     """
+    stale_window = max(stale_ttl, stale_if_error)
+    
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        # Background refreshes in progress, by cache key
+        refreshing: Dict[str, "asyncio.Task"] = {}
+        
+        async def fill(cache_key: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+            """Call the function once for all concurrent callers and cache the result."""
+            async def call() -> Any:
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                finally:
+                    cache.metrics(cache_key).fetch_latency.observe(time.perf_counter() - started)
+                # Store responses as their encoded bytes
+                value = CachedResponse.from_response(result) or result
+                # Keep the last good value for stale serving instead of caching an error
+                if not (stale_window and _is_error_result(result)):
+                    cache.set(cache_key, value, ttl, stale_ttl=stale_window)
+                return value
+            return await cache.fills.do(cache_key, call, timeout=fill_timeout)
+        
+        async def refresh(cache_key: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+            try:
+                result = await fill(cache_key, args, kwargs)
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %r", cache_key, e)
+                return
+            if _is_error_result(result):
+                logger.warning("Background refresh of %s returned an error, keeping the stale value", cache_key)
+        
         @functools.wraps(func)
         async def async_wrapper(*args: Any, **kwargs: Any) -> T:
-            # Create a unique key based on the function name, args, and kwargs
-            key_parts = [key_prefix or func.__name__]
-            
-            # Add positional arguments to the key
-            if args:
-                key_parts.append("_".join(str(arg) for arg in args))
-            
-            # Add keyword arguments to the key (sorted to ensure consistent order)
-            if kwargs:
-                key_parts.append("_".join(f"{k}={v}" for k, v in sorted(kwargs.items())))
-            
-            # Create the final key
-            cache_key = ":".join(key_parts)
-            
-            # Try to get the value from the cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-            
-            # Call the function and cache the result
-            result = await func(*args, **kwargs)
-            cache.set(cache_key, result, ttl)
-            return result
+            started = time.perf_counter()
+            cache_key = _build_key(func, key_prefix, key_func, args, kwargs)
+            hit = False
+            try:
+                # Try to get the value from the cache, including a stale one if allowed
+                entry = cache.get_entry(cache_key, allow_stale=bool(stale_window))
+                if entry is not None:
+                    now = time.time()
+                    fresh = entry.is_fresh(now)
+                    
+                    # Serve stale or restored values and refresh them in the background
+                    if (fresh and entry.revalidate) or (not fresh and now <= entry.expiry + stale_ttl):
+                        if cache_key not in refreshing:
+                            task = asyncio.ensure_future(refresh(cache_key, args, kwargs))
+                            refreshing[cache_key] = task
+                            task.add_done_callback(lambda _, key=cache_key: refreshing.pop(key, None))
+                        hit = True
+                        return _unwrap(entry.value)
+                    
+                    if fresh:
+                        hit = True
+                        return _unwrap(entry.value)
+                
+                # Fall back to the stale value if the call fails
+                can_serve_stale = entry is not None and time.time() <= entry.expiry + stale_if_error
+                try:
+                    result = await fill(cache_key, args, kwargs)
+                except Exception as e:
+                    if can_serve_stale:
+                        logger.warning("Serving stale %s after refresh failed: %r", cache_key, e)
+                        return _unwrap(entry.value)
+                    raise
+                if can_serve_stale and _is_error_result(result):
+                    logger.warning("Serving stale %s after refresh returned an error", cache_key)
+                    return _unwrap(entry.value)
+                return _unwrap(result)
+            finally:
+                metrics = cache.metrics(cache_key)
+                histogram = metrics.hit_latency if hit else metrics.miss_latency
+                histogram.observe(time.perf_counter() - started)
         
         @functools.wraps(func)
         def sync_wrapper(*args: Any, **kwargs: Any) -> T:
-            # Create a unique key based on the function name, args, and kwargs
-            key_parts = [key_prefix or func.__name__]
-            
-            # Add positional arguments to the key
-            if args:
-                key_parts.append("_".join(str(arg) for arg in args))
-            
-            # Add keyword arguments to the key (sorted to ensure consistent order)
-            if kwargs:
-                key_parts.append("_".join(f"{k}={v}" for k, v in sorted(kwargs.items())))
-            
-            # Create the final key
-            cache_key = ":".join(key_parts)
+            cache_key = _build_key(func, key_prefix, key_func, args, kwargs)
             
             # Try to get the value from the cache
             cached_value = cache.get(cache_key)
@@ -190,14 +913,34 @@ def cached(ttl: int = 60, key_prefix: str = "") -> Callable[[Callable[..., T]],
 
 def invalidate_cache(pattern: str = "") -> None:
     """
-    Invalidate cache entries matching a pattern.
+    Invalidate cache entries under a key prefix.
     
     Args:
-        pattern: Pattern to match (default: "" which matches all keys)
+        pattern: Key prefix, matched by whole segments (default: "" which matches all keys)
     """
     if pattern:
         cache.delete_pattern(pattern)
     else:
         cache.clear()
 
+def invalidate_path(key_prefix: str, path_parts: List[str]) -> int:
+    """
+    Invalidate the cache entries a change at a path can affect.
+    
+    These are the entry for each ancestor of the path (whose value contains
+    the path) and every entry at or below the path. Siblings are kept.
+    
+    Args:
+        key_prefix: Prefix of the keys, e.g. "config"
+        path_parts: Path that changed, e.g. ["interfaces", "ethernet", "eth1"]
+        
+    Returns:
+        Number of entries invalidated
+    """
+    count = 0
+    for depth in range(len(path_parts)):
+        if cache.delete(KEY_SEPARATOR.join([key_prefix] + list(path_parts[:depth]))):
+            count += 1
+    return count + cache.delete_pattern(KEY_SEPARATOR.join([key_prefix] + list(path_parts)))
+
 import asyncio 
\ No newline at end of file
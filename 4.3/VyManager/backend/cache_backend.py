@@ -0,0 +1,750 @@
+import heapq
+import os
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+class CacheEntry:
+    """
+    A cached value with its expiry time and estimated size.
+    
+    After expiry the entry is kept until stale_until, so it can still be
+    served while it is refreshed or when refreshing fails. Entries restored
+    from a snapshot are marked for revalidation: they are served, and the
+    first hit refreshes them in the background.
+    """
+    __slots__ = ("value", "expiry", "stale_until", "size", "revalidate")
+    
+    def __init__(self, value: Any, expiry: float, size: int, stale_until: Optional[float] = None, revalidate: bool = False):
+        self.value = value
+        self.expiry = expiry
+        self.stale_until = expiry if stale_until is None else stale_until
+        self.size = size
+        self.revalidate = revalidate
+    
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.expiry >= (time.time() if now is None else now)
+
+
+# Separator between the hierarchical segments of a cache key
+KEY_SEPARATOR = ":"
+
+
+def key_prefix(key: str) -> str:
+    """Get the first segment of a cache key, which names the kind of data cached."""
+    return key.split(KEY_SEPARATOR, 1)[0]
+
+
+class _KeyNode:
+    """Node of the key index trie."""
+    __slots__ = ("children", "key")
+    
+    def __init__(self):
+        self.children: Dict[str, "_KeyNode"] = {}
+        self.key: Optional[str] = None
+
+
+class KeyIndex:
+    """
+    Trie over the ':'-separated segments of cache keys.
+    
+    Finding the keys under a prefix walks only the matching subtree, so the
+    cost grows with the number of matches rather than the number of keys.
+    Keys are always split the same way, so segments that themselves contain
+    ':' (such as IPv6 addresses) still match consistently.
+    """
+    
+    def __init__(self):
+        self._root = _KeyNode()
+    
+    def add(self, key: str) -> None:
+        node = self._root
+        for segment in key.split(KEY_SEPARATOR):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _KeyNode()
+            node = child
+        node.key = key
+    
+    def discard(self, key: str) -> None:
+        node = self._root
+        path = []
+        for segment in key.split(KEY_SEPARATOR):
+            child = node.children.get(segment)
+            if child is None:
+                return
+            path.append((node, segment))
+            node = child
+        node.key = None
+        
+        # Prune nodes left without keys or children
+        for parent, segment in reversed(path):
+            child = parent.children[segment]
+            if child.key is not None or child.children:
+                break
+            del parent.children[segment]
+    
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        """
+        Get all keys whose leading segments equal the segments of a prefix.
+        
+        Args:
+            prefix: Key prefix, e.g. "config" or "dynamic:show"
+            
+        Returns:
+            Matching keys
+        """
+        node = self._root
+        for segment in prefix.split(KEY_SEPARATOR):
+            node = node.children.get(segment)
+            if node is None:
+                return []
+        
+        keys = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.key is not None:
+                keys.append(node.key)
+            stack.extend(node.children.values())
+        return keys
+    
+    def clear(self) -> None:
+        self._root = _KeyNode()
+
+
+class CacheBackend:
+    """
+    Storage for cache entries.
+    
+    Backends store entries and evict them when over their bounds. Expiry,
+    statistics and decorators are handled by Cache on top of a backend.
+    Shared backends also carry invalidation messages and small pieces of
+    shared state between worker processes.
+    """
+    # Whether the storage is shared with other worker processes
+    shared = False
+    
+    def __init__(self):
+        self.max_items = 0
+        self.max_bytes = 0
+        self.evictions = 0
+        self.evictions_by_prefix: Dict[str, int] = {}
+        # Operations that found shared storage locked by another process
+        self.busy = 0
+    
+    def _count_eviction(self, key: str) -> None:
+        prefix = key_prefix(key)
+        self.evictions += 1
+        self.evictions_by_prefix[prefix] = self.evictions_by_prefix.get(prefix, 0) + 1
+    
+    def configure(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """
+        Set the storage bounds, evicting entries if the backend is now over them.
+        
+        Args:
+            max_items: Maximum number of entries (0 for no limit)
+            max_bytes: Approximate maximum size of all values in bytes (0 for no limit)
+        """
+        if max_items is not None:
+            self.max_items = max_items
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.evict()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+    
+    def touch(self, key: str) -> None:
+        """Record a hit on a key, for backends that evict by recency."""
+    
+    def set(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+    
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete a key and all keys below it, matched by whole ':'-separated segments."""
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        raise NotImplementedError
+    
+    def evict(self) -> None:
+        """Evict entries until the backend is within its bounds."""
+    
+    def count(self) -> Tuple[int, int]:
+        """Get the number of entries and their total size in bytes."""
+        raise NotImplementedError
+    
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        """Get all stored entries, next to be evicted first."""
+        raise NotImplementedError
+    
+    def count_expired(self, now: float) -> int:
+        """Get the number of stored entries that expired before now."""
+        raise NotImplementedError
+    
+    def usage_by_prefix(self) -> Dict[str, Tuple[int, int]]:
+        """Get the number of entries and their total size in bytes for each key prefix."""
+        raise NotImplementedError
+    
+    def sweep(self, now: float) -> int:
+        """Remove entries whose stale window ended before now and return how many were removed."""
+        raise NotImplementedError
+    
+    def publish_invalidation(self, prefix: str) -> None:
+        """Tell other processes that keys under a prefix were invalidated."""
+    
+    def poll_invalidations(self) -> List[str]:
+        """Get prefixes invalidated by other processes since the last poll."""
+        return []
+    
+    def get_state(self, name: str, default: Any = None) -> Any:
+        raise NotImplementedError
+    
+    def set_state(self, name: str, value: Any) -> None:
+        raise NotImplementedError
+    
+    def delete_state(self, name: str) -> None:
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Process-local LRU storage.
+    
+    Entries are kept in recency order and indexed by key segments, so
+    eviction is O(1) and prefix deletes only visit matching keys. A heap
+    ordered by removal time lets sweeps visit only the entries that are due.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._index = KeyIndex()
+        # (stale_until, key) pairs; pairs for replaced or deleted entries are skipped when popped
+        self._expiries: List[Tuple[float, str]] = []
+        self._bytes = 0
+        self._state: Dict[str, Any] = {}
+    
+    def _remove(self, key: str) -> CacheEntry:
+        entry = self._entries.pop(key)
+        self._index.discard(key)
+        self._bytes -= entry.size
+        return entry
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self._entries.get(key)
+    
+    def touch(self, key: str) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+    
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._index.add(key)
+        self._bytes += entry.size
+        heapq.heappush(self._expiries, (entry.stale_until, key))
+        
+        # Rebuild the heap when outdated pairs outnumber the live ones
+        if len(self._expiries) > 2 * len(self._entries) + 64:
+            self._expiries = [(item.stale_until, item_key) for item_key, item in self._entries.items()]
+            heapq.heapify(self._expiries)
+        self.evict()
+    
+    def delete(self, key: str) -> bool:
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+    
+    def delete_prefix(self, prefix: str) -> int:
+        keys = self._index.keys_with_prefix(prefix)
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+        self._expiries = []
+        self._bytes = 0
+    
+    def evict(self) -> None:
+        """Evict least recently used entries until the backend is within its bounds."""
+        while self._entries and (
+            (self.max_items and len(self._entries) > self.max_items)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._index.discard(key)
+            self._bytes -= entry.size
+            self._count_eviction(key)
+            logger.debug("Evicted cache entry %s", key, extra={"size": entry.size})
+    
+    def count(self) -> Tuple[int, int]:
+        return len(self._entries), self._bytes
+    
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        return list(self._entries.items())
+    
+    def count_expired(self, now: float) -> int:
+        return sum(1 for entry in self._entries.values() if entry.expiry < now)
+    
+    def usage_by_prefix(self) -> Dict[str, Tuple[int, int]]:
+        usage: Dict[str, Tuple[int, int]] = {}
+        for key, entry in self._entries.items():
+            prefix = key_prefix(key)
+            items, size = usage.get(prefix, (0, 0))
+            usage[prefix] = (items + 1, size + entry.size)
+        return usage
+    
+    def sweep(self, now: float) -> int:
+        removed = 0
+        while self._expiries and self._expiries[0][0] < now:
+            stale_until, key = heapq.heappop(self._expiries)
+            entry = self._entries.get(key)
+            if entry is not None and entry.stale_until == stale_until:
+                self._remove(key)
+                removed += 1
+        return removed
+    
+    def get_state(self, name: str, default: Any = None) -> Any:
+        return self._state.get(name, default)
+    
+    def set_state(self, name: str, value: Any) -> None:
+        self._state[name] = value
+    
+    def delete_state(self, name: str) -> None:
+        self._state.pop(name, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Storage in a local SQLite file shared by all worker processes on one host.
+    
+    Nothing read from the file is unpickled or executed: encoded responses
+    are stored as columns (body, status, media type, ETag), other values and
+    shared state as JSON. Values that are neither are not cached. The file
+    must still belong to the application, since its contents are served.
+    
+    Operations run on the event loop, so they wait at most BUSY_TIMEOUT_MS
+    for another process's write lock. A busy read is a miss and a busy cache
+    write is skipped; deletes and invalidations are deferred and retried in
+    order, and reads of the keys they cover are misses until then.
+    
+    Prefix deletes are range scans on the primary key. When over its bounds
+    the backend evicts the entries closest to expiry, since recording every
+    read would turn each cache hit into a write. Invalidations are appended
+    to a table that the other processes poll.
+    """
+    shared = True
+    
+    # Invalidation messages older than this are removed
+    INVALIDATION_RETENTION = 300.0
+    
+    # Bumped when the table layout changes; older files are emptied and recreated
+    SCHEMA_VERSION = 2
+    
+    # Milliseconds a cache operation waits for another process's write lock
+    # before it is answered as a miss, skipped or deferred
+    BUSY_TIMEOUT_MS = 50
+    
+    # Milliseconds shared state operations wait; they are rare and must not be lost
+    STATE_BUSY_TIMEOUT_MS = 2000
+    
+    def __init__(self, path: str, response_type: Optional[type] = None):
+        """
+        Open or create the shared cache file.
+        
+        Args:
+            path: Path of the SQLite database file
+            response_type: Class of the encoded responses to store as columns. It
+                must have body, status_code, media_type and etag attributes and
+                accept them as constructor arguments in that order.
+        
+        Raises:
+            PermissionError: If the file or its directory is not private to the current user
+        """
+        super().__init__()
+        self.path = path
+        self.response_type = response_type
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        # Writes that must not be lost, waiting for the write lock: (sql, params, (key, exact) deleted)
+        self._deferred: List[Tuple[str, Tuple[Any, ...], Optional[Tuple[str, bool]]]] = []
+        self._last_rowcount = 0
+        self._prepare_file(path)
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                for table in ("cache_entries", "cache_invalidations", "shared_state"):
+                    self._db.execute(f"DROP TABLE IF EXISTS {table}")
+                self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, status INTEGER, media_type TEXT, etag TEXT, "
+                "expiry REAL NOT NULL, stale_until REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_entries_stale_until ON cache_entries (stale_until)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_invalidations ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, prefix TEXT NOT NULL, "
+                "origin TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS shared_state (name TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            row = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations").fetchone()
+            # Cache operations run on the event loop, so they must not wait long for other processes
+            self._db.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        self._last_invalidation = row[0]
+        logger.info("Using shared cache file %s", path)
+    
+    @staticmethod
+    def _prepare_file(path: str) -> None:
+        """
+        Create the cache file readable only by the current user, refusing one planted by someone else.
+        
+        Args:
+            path: Path of the SQLite database file
+        
+        Raises:
+            PermissionError: If the file, its SQLite side files or its directory are unsafe
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not hasattr(os, "getuid"):
+            return
+        
+        uid = os.getuid()
+        dir_info = os.stat(directory)
+        # Others may create files in a shared directory unless it is sticky (like /tmp)
+        if dir_info.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not dir_info.st_mode & stat.S_ISVTX:
+            raise PermissionError(f"Cache directory {directory} is writable by other users")
+        
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        os.close(fd)
+        for candidate in (path, path + "-wal", path + "-shm"):
+            try:
+                info = os.lstat(candidate)
+            except FileNotFoundError:
+                continue
+            if info.st_uid != uid:
+                raise PermissionError(f"Cache file {candidate} is not owned by the current user")
+            if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                raise PermissionError(f"Cache file {candidate} is writable by other users")
+    
+    @staticmethod
+    def _prefix_range(prefix: str) -> Tuple[str, str]:
+        """Key range holding the keys below a prefix: from 'prefix:' up to 'prefix;'."""
+        return prefix + KEY_SEPARATOR, prefix + chr(ord(KEY_SEPARATOR) + 1)
+    
+    @staticmethod
+    def _is_busy(error: Exception) -> bool:
+        """Check whether an error means another process holds the write lock."""
+        message = str(error).lower()
+        return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+    
+    def _write_or_defer(self, sql: str, params: Tuple[Any, ...], covers: Optional[Tuple[str, bool]] = None) -> int:
+        """
+        Run a write that must not be lost, deferring it while the database is busy.
+        
+        Call with the lock held. Deferred writes are retried in order before
+        later operations, and reads of the keys they delete are misses meanwhile.
+        
+        Args:
+            sql: Statement to run
+            params: Statement parameters
+            covers: (key, exact) deleted by the statement, for deletes
+        
+        Returns:
+            Number of rows changed, 0 when deferred
+        """
+        self._deferred.append((sql, params, covers))
+        self._run_deferred()
+        if self._deferred:
+            self.busy += 1
+            return 0
+        return self._last_rowcount
+    
+    def _run_deferred(self) -> None:
+        """Retry deferred writes, oldest first, until one finds the database busy. Call with the lock held."""
+        while self._deferred:
+            sql, params, _ = self._deferred[0]
+            try:
+                self._last_rowcount = self._db.execute(sql, params).rowcount
+            except sqlite3.OperationalError as e:
+                if self._is_busy(e):
+                    return
+                raise
+            self._deferred.pop(0)
+    
+    def _delete_deferred(self, key: str) -> bool:
+        """Check whether a deferred delete covers a key."""
+        for _, _, covers in self._deferred:
+            if covers is None:
+                continue
+            prefix, exact = covers
+            if key == prefix or (not exact and (not prefix or key.startswith(prefix + KEY_SEPARATOR))):
+                return True
+        return False
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            self._run_deferred()
+            if self._deferred and self._delete_deferred(key):
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT body, status, media_type, etag, expiry, stale_until, size FROM cache_entries WHERE key = ?",
+                    (key,),
+                ).fetchone()
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                # Another process is writing; answer as a miss rather than wait
+                self.busy += 1
+                return None
+        if row is None:
+            return None
+        return self._entry(key, row)
+    
+    def _entry(self, key: str, row: Tuple[Any, ...]) -> Optional[CacheEntry]:
+        """Rebuild an entry from its columns, dropping it if it cannot be read."""
+        body, status, media_type, etag, expiry, stale_until, size = row
+        try:
+            if status is not None:
+                # Stored responses are served as they are, without being decoded
+                value = self.response_type(bytes(body), status, media_type, etag)
+            else:
+                value = codec.loads(body)
+        except Exception as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", key, e)
+            self.delete(key)
+            return None
+        return CacheEntry(value, expiry, size, stale_until)
+    
+    def set(self, key: str, entry: CacheEntry) -> None:
+        value = entry.value
+        if self.response_type is not None and isinstance(value, self.response_type):
+            row = (bytes(value.body), value.status_code, value.media_type, value.etag)
+        else:
+            try:
+                row = (codec.dumps(value), None, None, None)
+            except (TypeError, ValueError, OverflowError) as e:
+                logger.warning("Not caching %s: value cannot be stored in the shared cache: %s", key, e)
+                return
+        with self._lock:
+            self._run_deferred()
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, body, status, media_type, etag, expiry, stale_until, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, *row, entry.expiry, entry.stale_until, entry.size),
+                )
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                # Skipping a cache write only costs a later miss
+                self.busy += 1
+                return
+        self.evict()
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._write_or_defer("DELETE FROM cache_entries WHERE key = ?", (key,), (key, True)) > 0
+    
+    def delete_prefix(self, prefix: str) -> int:
+        low, high = self._prefix_range(prefix)
+        with self._lock:
+            return self._write_or_defer(
+                "DELETE FROM cache_entries WHERE key = ? OR (key >= ? AND key < ?)", (prefix, low, high), (prefix, False)
+            )
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._write_or_defer("DELETE FROM cache_entries", (), ("", False))
+    
+    def evict(self) -> None:
+        """Evict the entries closest to expiry until the backend is within its bounds."""
+        if not self.max_items and not self.max_bytes:
+            return
+        items, total = self.count()
+        if (not self.max_items or items <= self.max_items) and (not self.max_bytes or total <= self.max_bytes):
+            return
+        
+        with self._lock:
+            victims = []
+            try:
+                for key, size in self._db.execute("SELECT key, size FROM cache_entries ORDER BY stale_until"):
+                    if (not self.max_items or items <= self.max_items) and (not self.max_bytes or total <= self.max_bytes):
+                        break
+                    victims.append((key,))
+                    items -= 1
+                    total -= size
+                self._db.executemany("DELETE FROM cache_entries WHERE key = ?", victims)
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                # The next write evicts instead
+                self.busy += 1
+                return
+            for (key,) in victims:
+                self._count_eviction(key)
+        logger.debug("Evicted %d shared cache entries", len(victims))
+    
+    def count(self) -> Tuple[int, int]:
+        with self._lock:
+            try:
+                items, total = self._db.execute("SELECT COUNT(*), TOTAL(size) FROM cache_entries").fetchone()
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                self.busy += 1
+                return 0, 0
+        return items, int(total)
+    
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        # Reads are not recorded, so entries come in eviction order instead
+        with self._lock:
+            self._run_deferred()
+            try:
+                rows = self._db.execute(
+                    "SELECT key, body, status, media_type, etag, expiry, stale_until, size "
+                    "FROM cache_entries ORDER BY stale_until"
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                self.busy += 1
+                return []
+        entries = []
+        for key, *row in rows:
+            if self._deferred and self._delete_deferred(key):
+                continue
+            entry = self._entry(key, row)
+            if entry is not None:
+                entries.append((key, entry))
+        return entries
+    
+    def count_expired(self, now: float) -> int:
+        with self._lock:
+            try:
+                return self._db.execute("SELECT COUNT(*) FROM cache_entries WHERE expiry < ?", (now,)).fetchone()[0]
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                self.busy += 1
+                return 0
+    
+    def usage_by_prefix(self) -> Dict[str, Tuple[int, int]]:
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    "SELECT substr(key, 1, instr(key || ?, ?) - 1) AS prefix, COUNT(*), TOTAL(size) "
+                    "FROM cache_entries GROUP BY prefix",
+                    (KEY_SEPARATOR, KEY_SEPARATOR),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                self.busy += 1
+                return {}
+        return {prefix: (items, int(size)) for prefix, items, size in rows}
+    
+    def sweep(self, now: float) -> int:
+        with self._lock:
+            self._run_deferred()
+            try:
+                return self._db.execute("DELETE FROM cache_entries WHERE stale_until < ?", (now,)).rowcount
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                # The next sweep removes them
+                self.busy += 1
+                return 0
+    
+    def publish_invalidation(self, prefix: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._write_or_defer(
+                "INSERT INTO cache_invalidations (prefix, origin, created) VALUES (?, ?, ?)",
+                (prefix, self.origin, now),
+            )
+            try:
+                self._db.execute("DELETE FROM cache_invalidations WHERE created < ?", (now - self.INVALIDATION_RETENTION,))
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+    
+    def poll_invalidations(self) -> List[str]:
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    "SELECT id, prefix, origin FROM cache_invalidations WHERE id > ? ORDER BY id",
+                    (self._last_invalidation,),
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if not self._is_busy(e):
+                    raise
+                # Picked up by the next poll
+                self.busy += 1
+                return []
+        if rows:
+            self._last_invalidation = rows[-1][0]
+        return [prefix for _, prefix, origin in rows if origin != self.origin]
+    
+    @contextmanager
+    def _patient(self):
+        """Wait longer for the write lock, for rare operations that must not be skipped. Call with the lock held."""
+        self._db.execute(f"PRAGMA busy_timeout = {self.STATE_BUSY_TIMEOUT_MS}")
+        try:
+            yield
+        finally:
+            self._db.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+    
+    def get_state(self, name: str, default: Any = None) -> Any:
+        with self._lock, self._patient():
+            row = self._db.execute("SELECT value FROM shared_state WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return default
+        try:
+            return codec.loads(row[0])
+        except ValueError as e:
+            logger.warning("Ignoring unreadable shared state %s: %s", name, e)
+            return default
+    
+    def set_state(self, name: str, value: Any) -> None:
+        with self._lock, self._patient():
+            self._run_deferred()
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_state (name, value) VALUES (?, ?)",
+                (name, codec.dumps(value)),
+            )
+    
+    def delete_state(self, name: str) -> None:
+        with self._lock, self._patient():
+            self._run_deferred()
+            self._db.execute("DELETE FROM shared_state WHERE name = ?", (name,))
+    
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -3,13 +3,61 @@ import os
 from urllib.parse import urlparse, urljoin
 import aiohttp
 import logging
-from utils import make_api_request, VyOSAPIError
+from utils import (
+    make_api_request, SingleFlight, RequestScheduler, CircuitBreaker, VyOSAPIError, OUTCOME_UNKNOWN,
+    PRIORITY_INTERACTIVE, PRIORITY_READ, PRIORITY_BACKGROUND,
+)
 import asyncio
+import codec
+import ssl
 import sys
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connection pool defaults
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 30.0
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Retry and circuit breaker defaults
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.2
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_TIMEOUT = 30.0
+
+# Responses larger than this many bytes are decoded incrementally when ijson is installed
+DEFAULT_STREAM_THRESHOLD = 8 * 1024 * 1024
+
+# Per-operation request timeouts in seconds; other operations use the default
+OPERATION_TIMEOUTS = {
+    "showConfig": 15.0,
+    "exists": 10.0,
+    "returnValues": 10.0,
+    "show": 30.0,
+    "set": 60.0,
+    "delete": 60.0,
+    "comment": 60.0,
+    "batch": 120.0,
+    "save": 60.0,
+    "load": 120.0,
+    "add": 900.0,
+    "reboot": 15.0,
+    "poweroff": 15.0,
+}
+
+# Write-combining defaults
+DEFAULT_WRITE_WINDOW = 0.05
+DEFAULT_MAX_BATCH_OPERATIONS = 100
+
+# Read-only (endpoint, op) pairs whose concurrent identical calls can be coalesced
+READ_OPERATIONS = {
+    ("/retrieve", "showConfig"),
+    ("/retrieve", "exists"),
+    ("/retrieve", "returnValues"),
+    ("/show", "show"),
+}
+
 # Import endpoint handlers
 from endpoints.retrieve import RetrieveEndpoint, ShowConfigEndpoint
 from endpoints.show import ShowEndpoint
@@ -66,10 +114,10 @@ class PathBuilder:
             API response as a dictionary
         """
         try:
-            print(f"Making {self.endpoint} request with op={self.op}, path={self.path}")
+            logger.debug("Making %s request with op=%s, path=%s", self.endpoint, self.op, self.path)
             return await self.client.execute_request(self.endpoint, self.op, self.path, **kwargs)
         except Exception as e:
-            print(f"Error in PathBuilder.__call__: {str(e)}")
+            logger.warning("Error in PathBuilder.__call__: %s", e)
             raise
 
 class ConfigureBuilder:
@@ -203,12 +251,160 @@ class BatchOperation:
         """
         return await self.client.execute_request("/configure", "batch", self.operations)
 
+class WriteCombiner:
+    """
+    Holds configure operations for a short window and sends them as one batch.
+    
+    Every operation submitted within the window is sent in a single
+    BatchOperation, so the router runs one commit instead of one per call.
+    The batch is applied atomically by VyOS, so when the router rejects it
+    nothing was applied: it is split in halves and resent until each failing
+    operation is on its own, so every caller gets the outcome of its own
+    operation. A batch whose outcome is unknown is never resent.
+    """
+    
+    def __init__(self, client, window=DEFAULT_WRITE_WINDOW, max_operations=DEFAULT_MAX_BATCH_OPERATIONS):
+        """
+        Initialize a new WriteCombiner instance.
+        
+        Args:
+            client: VyOSClient instance
+            window: Seconds to hold writes before sending the batch (default: 0.05)
+            max_operations: Send the batch early once it holds this many operations (default: 100)
+        """
+        self.client = client
+        self.window = window
+        self.max_operations = max_operations
+        self._pending = []
+        self._timer = None
+        # Running flushes, kept referenced so they are not garbage-collected mid-run
+        self._flushes = set()
+        self.batches_sent = 0
+        self.operations_sent = 0
+        self.batches_split = 0
+    
+    async def submit(self, op, path):
+        """
+        Queue a configure operation and wait for the batch it is sent in.
+        
+        Args:
+            op: Operation type ('set', 'delete' or 'comment')
+            path: Path list for the operation
+            
+        Returns:
+            This caller's copy of the API response for the batch its operation succeeded
+            in, or for its own operation if it failed
+        """
+        if op not in ("set", "delete", "comment"):
+            raise ValueError(f"Unsupported operation for write combining: {op}")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, list(path), future))
+        
+        if len(self._pending) >= self.max_operations:
+            self._start_flush(self._take_pending())
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+        
+        # Shield so a disconnecting caller does not cancel the shared batch result
+        return await asyncio.shield(future)
+    
+    def _take_pending(self):
+        """Take all queued operations and cancel the pending window timer."""
+        pending, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return pending
+    
+    def _start_flush(self, pending):
+        """Send operations in a background task that is tracked until it finishes."""
+        task = asyncio.ensure_future(self._flush(pending))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def _flush_later(self):
+        """Send the queued operations once the window has elapsed."""
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._start_flush(self._take_pending())
+    
+    async def close(self):
+        """Send the queued operations and wait for all batches in flight."""
+        self._start_flush(self._take_pending())
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    async def _flush(self, pending):
+        """
+        Send queued operations as one batch and resolve each caller.
+        
+        A failed batch of several operations is split in halves, which are
+        sent in order, until the failure is narrowed down to single
+        operations. While the router is unavailable nothing is resent.
+        
+        Args:
+            pending: List of (op, path, future) tuples
+        """
+        if not pending:
+            return
+        
+        batch = BatchOperation(self.client)
+        for op, path, _ in pending:
+            getattr(batch, op)(path)
+        
+        self.batches_sent += 1
+        self.operations_sent += len(pending)
+        logger.info("Sending %d combined configure operation(s) as one batch", len(pending))
+        
+        error = None
+        try:
+            result = await batch.execute()
+        except Exception as e:
+            result = None
+            error = e
+        
+        # Only a batch the router answered and rejected is known to have changed nothing
+        if error is not None:
+            rejected = isinstance(error, VyOSAPIError) and error.status_code is not None and error.status_code < 500
+        else:
+            rejected = (
+                isinstance(result, dict) and result.get("success") is False
+                and result.get("outcome") != OUTCOME_UNKNOWN
+            )
+        if rejected and len(pending) > 1 and self.client.breaker.state == CircuitBreaker.CLOSED:
+            # Nothing was applied, so resend the halves to find the failing operations
+            self.batches_split += 1
+            middle = len(pending) // 2
+            logger.info("Combined batch of %d operation(s) failed, resending it in halves", len(pending))
+            await self._flush(pending[:middle])
+            await self._flush(pending[middle:])
+            return
+        
+        if error is not None:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        
+        for _, _, future in pending:
+            if not future.done():
+                caller_result = dict(result) if isinstance(result, dict) else {"success": True, "data": result, "error": None}
+                caller_result["batch_size"] = len(pending)
+                future.set_result(caller_result)
+
 class VyOSClient:
     """
     Client for interacting with the VyOS API.
     """
     
-    def __init__(self, host, api_key, https=True, cert_path=None, trust_self_signed=False):
+    def __init__(self, host, api_key, https=True, cert_path=None, trust_self_signed=False,
+                 pool_size=DEFAULT_POOL_SIZE, keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+                 write_window=DEFAULT_WRITE_WINDOW, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_backoff=DEFAULT_RETRY_BACKOFF, breaker_threshold=DEFAULT_BREAKER_THRESHOLD,
+                 breaker_reset_timeout=DEFAULT_BREAKER_RESET_TIMEOUT,
+                 stream_threshold=DEFAULT_STREAM_THRESHOLD, debug_responses=False):
         """
         Initialize a new VyOSClient instance.
         
@@ -218,6 +414,18 @@ class VyOSClient:
             https: Whether to use HTTPS (default: True)
             cert_path: Path to SSL certificate (default: None)
             trust_self_signed: Whether to trust self-signed certificates (default: False)
+            pool_size: Maximum number of pooled connections to the router (default: 10)
+            keepalive_timeout: Seconds an idle pooled connection is kept open (default: 30)
+            write_window: Seconds combined configure writes are held before sending (default: 0.05)
+            max_concurrency: Maximum concurrent requests sent to the router (default: 4)
+            request_timeout: Timeout in seconds for operations without a specific timeout (default: 30)
+            max_retries: Retries for failed idempotent reads (default: 2)
+            retry_backoff: Base delay in seconds for jittered exponential backoff (default: 0.2)
+            breaker_threshold: Consecutive failures before the circuit breaker opens (default: 5)
+            breaker_reset_timeout: Seconds the circuit stays open before probing (default: 30)
+            stream_threshold: Body size in bytes above which responses are decoded
+                incrementally, 0 to disable (default: 8 MiB)
+            debug_responses: Print a preview of every response body (default: False)
         """
         # Validate required parameters
         if not host:
@@ -228,7 +436,7 @@ class VyOSClient:
             
         # Normalize the host to ensure it doesn't already have http/https prefix
         if host.startswith("http://") or host.startswith("https://"):
-            print("Warning: Host should not include protocol. Removing protocol prefix.")
+            logger.warning("Host should not include protocol. Removing protocol prefix.")
             self.host = host.split("://")[1]
         else:
             self.host = host
@@ -237,25 +445,78 @@ class VyOSClient:
         self.https = https
         self.cert_path = cert_path
         self.trust_self_signed = trust_self_signed
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        
+        # Shared keep-alive session, created lazily inside the running event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Timeouts, retries and fail-fast behaviour while the router is unhealthy
+        self.request_timeout = request_timeout
+        self.timeouts = dict(OPERATION_TIMEOUTS)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset_timeout)
+        
+        # Response decoding
+        self.stream_threshold = stream_threshold
+        self.debug_responses = debug_responses
+        
+        # Bounded, prioritized access to the router API
+        self.scheduler = RequestScheduler(max_concurrency)
+        
+        # Concurrent identical reads share one upstream call
+        self.read_flight = SingleFlight()
+        
+        # Optional batching of individual configure writes
+        self.write_combiner = WriteCombiner(self, window=write_window)
         
         protocol = "https" if https else "http"
         self.base_url = f"{protocol}://{self.host}"
-        print(f"VyOSClient initialized with base URL: {self.base_url}")
+        logger.info("VyOSClient initialized with base URL: %s", self.base_url)
         
         # Log security configuration
         if self.https:
             if self.trust_self_signed:
-                print("WARNING: Configured to trust self-signed certificates. This should only be used in development environments.")
+                logger.warning("Configured to trust self-signed certificates. This should only be used in development environments.")
             elif not self.cert_path:
-                print("WARNING: Using HTTPS without a certificate path and not trusting self-signed certificates. This may cause connection issues with self-signed certificates.")
+                logger.warning("Using HTTPS without a certificate path and not trusting self-signed certificates. This may cause connection issues with self-signed certificates.")
             else:
-                print(f"Using HTTPS with certificate from: {self.cert_path}")
+                logger.info("Using HTTPS with certificate from: %s", self.cert_path)
         else:
-            print("WARNING: Using plain HTTP connection. This is not secure and should only be used in isolated networks.")
+            logger.warning("Using plain HTTP connection. This is not secure and should only be used in isolated networks.")
+        
+        # TLS context shared by the REST and GraphQL paths, built once
+        self.ssl_context = self._build_ssl_context()
         
         # Initialize endpoint handlers
         self._init_endpoints()
     
+    def _build_ssl_context(self) -> Optional[ssl.SSLContext]:
+        """
+        Build the TLS context used for every connection to the router.
+        
+        The CA bundle is loaded from disk only here, not per request.
+        
+        Returns:
+            An SSLContext for HTTPS, or None for plain HTTP
+        """
+        if not self.https:
+            return None
+        
+        if self.trust_self_signed:
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        elif self.cert_path:
+            ssl_context = ssl.create_default_context(cafile=self.cert_path)
+        else:
+            ssl_context = ssl.create_default_context()
+        
+        # Allow session tickets so the router can resume TLS sessions
+        ssl_context.options &= ~ssl.OP_NO_TICKET
+        return ssl_context
+    
     def _init_endpoints(self) -> None:
         """Initialize all endpoint handlers."""
         # Regular endpoint handlers
@@ -273,7 +534,48 @@ class VyOSClient:
         self.retrieve = RetrieveEndpoint(self)
         # self.showConfig = ShowConfigEndpoint(self)
         
-        print("VyOSClient endpoint handlers initialized")
+        logger.debug("VyOSClient endpoint handlers initialized")
+    
+    async def start(self) -> aiohttp.ClientSession:
+        """
+        Open the pooled keep-alive session used for all router requests.
+        
+        Safe to call more than once; an already open session is reused.
+        
+        Returns:
+            The shared aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+                ssl=self.ssl_context if self.ssl_context is not None else True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            logger.info("VyOSClient session opened", extra={"pool_size": self.pool_size, "keepalive_timeout": self.keepalive_timeout})
+        return self._session
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared session, opening it on first use.
+        
+        Returns:
+            The shared aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            return await self.start()
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared session and release all pooled connections."""
+        # Queued writes still need the session
+        await self.write_combiner.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("VyOSClient session closed")
+        self._session = None
     
     @property
     def showConfig(self):
@@ -440,21 +742,44 @@ class VyOSClient:
             Also returns the error message if the connection failed.
         """
         try:
-            print(f"Testing connection to VyOS router at {self.base_url}...")
-            result = await self.showConfig()
+            logger.info("Testing connection to VyOS router at %s", self.base_url)
+            result = await self.showConfig(priority=PRIORITY_BACKGROUND)
             
             if result.get("success") is True:
-                print("Connection test successful!")
+                logger.info("Connection test successful")
                 return True, None
             else:
                 error_msg = result.get("error", "Unknown error")
-                print(f"Connection test failed: {error_msg}")
+                logger.error("Connection test failed: %s", error_msg)
                 return False, error_msg
         except Exception as e:
-            print(f"Connection test failed with exception: {str(e)}")
+            logger.error("Connection test failed with exception: %s", e)
             return False, str(e)
     
-    async def execute_request(self, endpoint, op, path=None, **kwargs):
+    def stats(self):
+        """
+        Get client statistics.
+        
+        Returns:
+            Dictionary with circuit breaker, scheduler, read coalescing and write combining statistics
+        """
+        return {
+            "circuit_breaker": self.breaker.stats(),
+            "scheduler": self.scheduler.stats(),
+            "read_coalescing": {
+                "in_flight": self.read_flight.in_flight(),
+                "started": self.read_flight.started,
+                "coalesced": self.read_flight.coalesced,
+            },
+            "write_combining": {
+                "window": self.write_combiner.window,
+                "batches_sent": self.write_combiner.batches_sent,
+                "operations_sent": self.write_combiner.operations_sent,
+                "batches_split": self.write_combiner.batches_split,
+            },
+        }
+    
+    async def execute_request(self, endpoint, op, path=None, *, priority=None, **kwargs):
         """
         Execute an API request.
         
@@ -462,12 +787,17 @@ class VyOSClient:
             endpoint: API endpoint
             op: Operation to perform
             path: Path list (optional)
+            priority: Scheduling priority class (default: read for read-only
+                operations, interactive for everything else)
             **kwargs: Additional parameters
             
         Returns:
             API response
         """
         url = urljoin(self.base_url, endpoint)
+        read_only = (endpoint, op) in READ_OPERATIONS
+        if priority is None:
+            priority = PRIORITY_READ if read_only else PRIORITY_INTERACTIVE
         
         # Prepare the data payload
         if op == "batch":
@@ -485,42 +815,59 @@ class VyOSClient:
             for key, value in kwargs.items():
                 data[key] = value
         
+        # Merge concurrent identical reads into one upstream call
+        if read_only:
+            flight_key = (endpoint, op, tuple(path or ()), repr(sorted(kwargs.items())))
+            return await self.read_flight.do(flight_key, lambda: self._send_request(url, data, priority))
+        
+        return await self._send_request(url, data, priority)
+    
+    async def _send_request(self, url, data, priority):
+        """
+        Serialize a request payload and send it to the VyOS API.
+        
+        Args:
+            url: Full API endpoint URL
+            data: Request payload (dict, or list of operations for batch)
+            priority: Scheduling priority class
+            
+        Returns:
+            API response
+        """
         try:
-            print(f"Preparing request to VyOS API: {url}")
-            print(f"Request data: {data}")
+            logger.debug("Preparing request to VyOS API", extra={"url": url, "payload": data})
             
             # Convert data to a JSON string
             try:
-                import json
-                data_json = json.dumps(data)
+                data_json = codec.dumps_str(data)
             except (TypeError, ValueError) as e:
-                print(f"Error serializing request data to JSON: {e}")
+                logger.error("Error serializing request data to JSON: %s", e)
                 raise VyOSAPIError(f"Invalid request data: {str(e)}")
             
-            # Execute the request
-            result = await make_api_request(
-                url=url,
-                data=data_json,
-                client=self,
-            )
+            # Execute the request once the scheduler grants a slot
+            async with self.scheduler.slot(priority):
+                result = await make_api_request(
+                    url=url,
+                    data=data_json,
+                    client=self,
+                    op=data.get("op") if isinstance(data, dict) else "batch",
+                )
             
-            print(f"Received response from VyOS API: {result.get('success', False)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Received response from VyOS API", extra={"url": url, "success": result.get("success", False)})
             
             if "error" in result and result["error"] is not None:
-                print(f"API returned error: {result['error']}")
+                logger.warning("API returned error: %s", result["error"])
             
             return result
         except VyOSAPIError as e:
-            print(f"VyOS API error: {e.message}")
-            if hasattr(e, 'response') and e.response:
-                print(f"Response status: {e.response.status}")
-                response_text = getattr(e.response, 'text', 'No response text available')
-                print(f"Response content: {response_text}")
+            logger.warning(
+                "VyOS API error: %s", e.message,
+                extra={"status": getattr(e.response, "status", None) if e.response else None}
+            )
             raise
         except Exception as e:
-            print(f"Unexpected error in execute_request: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("Unexpected error in execute_request: %s", e)
             raise VyOSAPIError(f"Unexpected error: {str(e)}")
 
 class ConfigureEndpoint:
@@ -0,0 +1,93 @@
+import json
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse, Response
+
+# Use orjson when it is installed, otherwise fall back to the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the active backend, reported in statistics
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON.
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        The encoded JSON as bytes
+
+    Raises:
+        TypeError: If the object is not JSON-serializable
+        ValueError: If the object contains values JSON cannot represent
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson rejects some values the stdlib accepts (e.g. integers over 64 bits)
+            pass
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """
+    Encode an object as compact JSON text.
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        The encoded JSON as a string
+    """
+    if orjson is not None:
+        return dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Decode JSON from bytes or text.
+
+    Args:
+        data: The JSON document
+
+    Returns:
+        The decoded object
+
+    Raises:
+        ValueError: If the data is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the shared codec."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedJSONResponse(Response):
+    """
+    Response for a body that is already encoded JSON.
+
+    The bytes are sent as they are, without decoding or re-encoding.
+    """
+    media_type = "application/json"
@@ -0,0 +1,598 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
+import logging
+import re
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cache_backend import key_prefix
+from utils import SingleFlight, PRIORITY_READ, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Default seconds between scheduled refreshes of the mirrored configuration
+DEFAULT_REFRESH_INTERVAL = 240.0
+
+# Default seconds after which a read refreshes the mirror before answering
+DEFAULT_MAX_AGE = 300.0
+
+# Default seconds to wait after a write before checking the mirror against the router
+DEFAULT_VERIFY_DELAY = 2.0
+
+
+def normalize_path(path_parts: List[str]) -> List[str]:
+    """
+    Normalize config path parts the same way the client's path builder does.
+    
+    Args:
+        path_parts: Path parts from an API path
+    
+    Returns:
+        Path parts as they appear in the configuration tree
+    """
+    return [str(part).replace('_', '-') for part in path_parts]
+
+
+def slice_tree(tree: Any, path_parts: List[str]) -> Tuple[bool, Any]:
+    """
+    Get the part of a configuration tree at a path, shaped like showConfig output.
+    
+    As with showConfig, a leaf is returned wrapped in a dict keyed by its name.
+    
+    Args:
+        tree: The full configuration tree
+        path_parts: Normalized path parts
+    
+    Returns:
+        Tuple of (found, data)
+    """
+    node = tree
+    for part in path_parts:
+        if not isinstance(node, dict) or part not in node:
+            return False, None
+        node = node[part]
+    if path_parts and not isinstance(node, dict):
+        return True, {path_parts[-1]: node}
+    return True, node
+
+
+def limit_depth(node: Any, depth: int) -> Any:
+    """
+    Cut a configuration tree below a number of levels.
+    
+    Nodes at the cut keep their name but are returned empty; leaf values are
+    kept as they are.
+    
+    Args:
+        node: Configuration tree or subtree
+        depth: Levels of nodes to keep
+    
+    Returns:
+        The cut tree (a new object; the input is not changed)
+    """
+    if not isinstance(node, dict):
+        return node
+    if depth <= 0:
+        return {}
+    return {key: limit_depth(child, depth - 1) for key, child in node.items()}
+
+
+def project_tree(tree: Any, fields: Optional[List[List[str]]] = None, depth: Optional[int] = None) -> Any:
+    """
+    Select parts of a configuration tree.
+    
+    Selected subtrees keep their position in the tree, so the result has the
+    same shape as the full tree with everything else left out. Fields that do
+    not exist are skipped, and a field inside another selected field adds
+    nothing.
+    
+    Args:
+        tree: Configuration tree or subtree
+        fields: Normalized paths of the subtrees to keep (default: the whole tree)
+        depth: Levels to keep below the tree, or below each field (default: no limit)
+    
+    Returns:
+        The projected tree
+    """
+    if not fields:
+        return limit_depth(tree, depth) if depth is not None else tree
+    
+    result: Dict[str, Any] = {}
+    selected = set()
+    for field in sorted(fields, key=len):
+        if not field or any(tuple(field[:i]) in selected for i in range(1, len(field))):
+            continue
+        node = tree
+        for part in field:
+            if not isinstance(node, dict) or part not in node:
+                break
+            node = node[part]
+        else:
+            target = result
+            for part in field[:-1]:
+                target = target.setdefault(part, {})
+            target[field[-1]] = limit_depth(node, depth) if depth is not None else node
+            selected.add(tuple(field))
+    return result
+
+
+def _prune(tree: Dict[str, Any], path_parts: List[str]) -> None:
+    """Remove the dicts along a path that a deletion left empty, deepest first."""
+    for depth in range(len(path_parts), 0, -1):
+        found, node = slice_tree(tree, path_parts[:depth])
+        if not found or not isinstance(node, dict) or node:
+            return
+        parent = slice_tree(tree, path_parts[:depth - 1])[1]
+        del parent[path_parts[depth - 1]]
+
+
+def apply_set(tree: Dict[str, Any], path_parts: List[str]) -> bool:
+    """
+    Apply a configure set to a configuration tree in place.
+    
+    The last part is taken as the value of a leaf unless its parent is an
+    existing node, matching how showConfig shows leaf values. A value set on
+    an existing multi-value leaf is appended to it.
+    
+    Without the VyOS schema some writes cannot be placed for certain: a path
+    through missing nodes may end in a leaf value or in valueless nodes, and
+    a new value on a single-value leaf may replace it or make it multi-value.
+    These are applied as a leaf value and reported as guessed.
+    
+    Args:
+        tree: The configuration tree
+        path_parts: Path parts as sent to the router, ending with the value
+        
+    Returns:
+        True if the tree now matches the router, False if the result was guessed
+    """
+    if not path_parts:
+        return True
+    if len(path_parts) == 1:
+        tree.setdefault(path_parts[0], {})
+        return True
+    
+    certain = True
+    node = tree
+    for part in path_parts[:-2]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = node[part] = {}
+            certain = False
+        node = child
+    
+    name, value = path_parts[-2], path_parts[-1]
+    current = node.get(name)
+    if isinstance(current, dict):
+        current.setdefault(value, {})
+    elif isinstance(current, list):
+        if value not in current:
+            current.append(value)
+    else:
+        if current is not None and current != value:
+            certain = False
+        node[name] = value
+    return certain
+
+
+def apply_delete(tree: Dict[str, Any], path_parts: List[str]) -> None:
+    """
+    Apply a configure delete to a configuration tree in place.
+    
+    Deletes the node at the path, or the value at the end of the path from a
+    leaf. Nodes left without children are removed as VyOS does.
+    
+    Args:
+        tree: The configuration tree
+        path_parts: Path parts as sent to the router
+    """
+    if not path_parts:
+        return
+    found, parent = slice_tree(tree, path_parts[:-1])
+    if not found or not isinstance(parent, dict):
+        return
+    
+    last = path_parts[-1]
+    if last in parent:
+        del parent[last]
+        _prune(tree, path_parts[:-1])
+        return
+    
+    # The path ends with a value of a leaf
+    if len(path_parts) < 2:
+        return
+    found, holder = slice_tree(tree, path_parts[:-2])
+    name = path_parts[-2]
+    if not found or not isinstance(holder, dict) or name not in holder:
+        return
+    current = holder[name]
+    if isinstance(current, list) and last in current:
+        current.remove(last)
+        if len(current) == 1:
+            holder[name] = current[0]
+        elif not current:
+            del holder[name]
+    elif current == last:
+        del holder[name]
+    else:
+        return
+    _prune(tree, path_parts[:-2])
+
+
+class ConfigSnapshot:
+    """
+    Immutable copy of a configuration tree with a structural hash for every node.
+    
+    Each node's hash covers its whole subtree, so two snapshots share a
+    subtree exactly when the hashes of its root are equal.
+    """
+    
+    def __init__(self, tree: Dict[str, Any], version: int = 0, created: Optional[float] = None):
+        """
+        Initialize the snapshot.
+        
+        Args:
+            tree: Configuration tree (copied)
+            version: Mirror version the tree was taken at
+            created: Time the tree was taken (default: now)
+        """
+        self.tree = copy.deepcopy(tree)
+        self.version = version
+        self.created = created if created is not None else time.time()
+        # Hashes of the dict nodes, keyed by node id; the snapshot keeps the nodes alive
+        self.hashes: Dict[int, bytes] = {}
+        self.root_hash = self._hash(self.tree)
+    
+    def _hash(self, node: Any) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(node, dict):
+            for key in sorted(node):
+                digest.update(key.encode())
+                digest.update(b"\0")
+                digest.update(self._hash(node[key]))
+            node_hash = digest.digest()
+            self.hashes[id(node)] = node_hash
+            return node_hash
+        digest.update(b"v")
+        digest.update(json.dumps(node, sort_keys=True).encode())
+        return digest.digest()
+    
+    def hash_of(self, node: Any) -> Optional[bytes]:
+        return self.hashes.get(id(node))
+
+
+# Node names the CLI reads as a single word without quotes
+_PLAIN_WORD = re.compile(r"[A-Za-z0-9._:/@+-]+")
+
+
+def _quote(value: Any) -> str:
+    return "'" + str(value).replace("'", "'\\''") + "'"
+
+
+def _path_text(path_parts: List[str]) -> str:
+    return " ".join(path_parts)
+
+
+def _command_path(path_parts: List[str]) -> str:
+    """Path for a set or delete command, quoting node names as the VyOS CLI does."""
+    return " ".join(part if _PLAIN_WORD.fullmatch(part) else _quote(part) for part in path_parts)
+
+
+def _set_commands(path_parts: List[str], node: Any, out: List[str]) -> None:
+    """Add the set commands that create a node and everything under it."""
+    if isinstance(node, dict):
+        if not node:
+            out.append(f"set {_command_path(path_parts)}")
+        for key, child in node.items():
+            _set_commands(path_parts + [key], child, out)
+    elif isinstance(node, list):
+        for value in node:
+            out.append(f"set {_command_path(path_parts)} {_quote(value)}")
+    else:
+        out.append(f"set {_command_path(path_parts)} {_quote(node)}")
+
+
+def _diff_nodes(old: ConfigSnapshot, new: ConfigSnapshot, old_node: Dict[str, Any], new_node: Dict[str, Any],
+                path_parts: List[str], result: Dict[str, List[str]]) -> None:
+    old_hash = old.hash_of(old_node)
+    if old_hash is not None and old_hash == new.hash_of(new_node):
+        # Identical subtree
+        return
+    
+    for key, old_child in old_node.items():
+        child_path = path_parts + [key]
+        if key not in new_node:
+            result["removed"].append(_path_text(child_path))
+            result["commands"].append(f"delete {_command_path(child_path)}")
+            continue
+        
+        new_child = new_node[key]
+        if isinstance(old_child, dict) and isinstance(new_child, dict):
+            _diff_nodes(old, new, old_child, new_child, child_path, result)
+        elif old_child != new_child:
+            result["changed"].append(_path_text(child_path))
+            if isinstance(old_child, list) and isinstance(new_child, list):
+                # Multi-value leaf: only the values that came or went
+                for value in old_child:
+                    if value not in new_child:
+                        result["commands"].append(f"delete {_command_path(child_path)} {_quote(value)}")
+                for value in new_child:
+                    if value not in old_child:
+                        result["commands"].append(f"set {_command_path(child_path)} {_quote(value)}")
+            else:
+                if isinstance(old_child, (dict, list)) or isinstance(new_child, (dict, list)):
+                    result["commands"].append(f"delete {_command_path(child_path)}")
+                _set_commands(child_path, new_child, result["commands"])
+    
+    for key, new_child in new_node.items():
+        if key not in old_node:
+            child_path = path_parts + [key]
+            result["added"].append(_path_text(child_path))
+            _set_commands(child_path, new_child, result["commands"])
+
+
+def diff_snapshots(old: ConfigSnapshot, new: ConfigSnapshot) -> Dict[str, List[str]]:
+    """
+    Compare two configuration snapshots.
+    
+    Subtrees with equal structural hashes are skipped without being walked.
+    
+    Args:
+        old: Snapshot to compare from
+        new: Snapshot to compare to
+    
+    Returns:
+        Dictionary with the added, removed and changed paths, and the set and
+        delete commands that turn the old configuration into the new one
+    """
+    result: Dict[str, List[str]] = {"added": [], "removed": [], "changed": [], "commands": []}
+    _diff_nodes(old, new, old.tree, new.tree, [], result)
+    return result
+
+
+class ConfigMirror:
+    """
+    Versioned in-memory copy of the router's running configuration.
+    
+    One full showConfig call fills the mirror, and config subtrees are then
+    answered by slicing it. The copy is refreshed on a schedule at background
+    priority. After a config cache invalidation the next read refreshes it
+    first. Every refresh that finds a different tree increments the version.
+    
+    Successful writes are applied to the copy in place, and a background check
+    against the router shortly afterwards corrects any drift.
+    """
+    
+    def __init__(self, client, refresh_interval: float = DEFAULT_REFRESH_INTERVAL, max_age: float = DEFAULT_MAX_AGE,
+                 verify_delay: float = DEFAULT_VERIFY_DELAY):
+        """
+        Initialize the mirror.
+        
+        Args:
+            client: VyOSClient used to fetch the configuration
+            refresh_interval: Seconds between scheduled refreshes (0 disables them)
+            max_age: Seconds after which a read refreshes the mirror first
+            verify_delay: Seconds to wait after a write before checking the mirror against the router
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.verify_delay = verify_delay
+        self.tree: Optional[Dict[str, Any]] = None
+        self.version = 0
+        self.fetched_at = 0.0
+        self.stale = True
+        self.refreshes = 0
+        self.failures = 0
+        self.slices = 0
+        self.writes = 0
+        self.drifts = 0
+        # Called with the new version when a refresh finds a changed tree
+        self.on_change: Optional[Callable[[int], None]] = None
+        self._suppressed = False
+        self._verifier: Optional[asyncio.Task] = None
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._flight = SingleFlight()
+    
+    def is_fresh(self) -> bool:
+        return self.tree is not None and not self.stale and time.time() - self.fetched_at < self.max_age
+    
+    def invalidate(self, prefix: str = "") -> None:
+        """
+        Mark the mirror stale if a cache invalidation covers the configuration.
+        
+        Registered as a cache invalidation listener, so invalidations from
+        other worker processes reach it as well.
+        
+        Args:
+            prefix: Invalidated cache key prefix ("" for everything)
+        """
+        # Ignore invalidations for changes the mirror applies itself
+        if self._suppressed:
+            return
+        if not prefix or key_prefix(prefix) == "config":
+            self.stale = True
+    
+    @contextmanager
+    def local_write(self):
+        """
+        Keep the mirror fresh through cache invalidations for a local write.
+        
+        The write is applied with apply() once it succeeds, so the mirror
+        does not need to be refreshed from the router.
+        """
+        suppressed = self._suppressed
+        self._suppressed = True
+        try:
+            yield
+        finally:
+            self._suppressed = suppressed
+    
+    def apply(self, op: str, path_parts: List[str]) -> None:
+        """
+        Apply a successful configure set or delete to the mirrored tree.
+        
+        A set whose place in the tree had to be guessed marks the mirror
+        stale, so the tree is fetched again before it is served.
+        
+        Args:
+            op: Operation, "set" or "delete" (others do not change the tree)
+            path_parts: Path parts as sent to the router
+        """
+        if op not in ("set", "delete"):
+            return
+        if self.tree is None:
+            return
+        
+        if op == "set":
+            certain = apply_set(self.tree, [str(part) for part in path_parts])
+        else:
+            apply_delete(self.tree, [str(part) for part in path_parts])
+            certain = True
+        self.version += 1
+        self.writes += 1
+        if not certain:
+            # Fetch the tree again rather than serve a guess
+            self.stale = True
+            return
+        self.schedule_verify()
+    
+    def schedule_verify(self) -> None:
+        """Check the mirror against the router after the verify delay, once for a burst of writes."""
+        if self._verifier is not None and not self._verifier.done():
+            return
+        try:
+            self._verifier = asyncio.get_running_loop().create_task(self._verify())
+        except RuntimeError:
+            # No event loop; the next scheduled refresh checks the mirror instead
+            self.stale = True
+    
+    async def _verify(self) -> None:
+        await asyncio.sleep(self.verify_delay)
+        try:
+            await self.refresh(priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            self.stale = True
+            logger.warning("Config mirror check after write failed: %s", e)
+    
+    async def refresh(self, priority: int = PRIORITY_READ) -> Dict[str, Any]:
+        """
+        Fetch the full configuration, sharing one call between concurrent callers.
+        
+        Args:
+            priority: Scheduler priority for the router request
+        
+        Returns:
+            The configuration tree
+        
+        Raises:
+            RuntimeError: If the router did not return a configuration
+        """
+        return await self._flight.do("showConfig", lambda: self._fetch(priority))
+    
+    async def _fetch(self, priority: int) -> Dict[str, Any]:
+        # Invalidations arriving during the fetch are not covered by its result
+        self.stale = False
+        writes = self.writes
+        try:
+            result = await self.client.showConfig(priority=priority)
+        except Exception:
+            self.stale = True
+            self.failures += 1
+            raise
+        
+        if not isinstance(result, dict) or not result.get("success") or not isinstance(result.get("data"), dict):
+            self.stale = True
+            self.failures += 1
+            error = result.get("error") if isinstance(result, dict) else None
+            raise RuntimeError(error or "Router returned no configuration")
+        
+        tree = result["data"]
+        if self.writes != writes and self.tree is not None:
+            # Writes applied during the fetch are newer than its result, so fetch again on the next read
+            self.stale = True
+            return self.tree
+        
+        changed = self.tree is not None and tree != self.tree
+        if changed:
+            # Changed outside VyManager, or an applied write did not match the router
+            self.drifts += 1
+        if tree != self.tree:
+            self.tree = tree
+            self.version += 1
+            logger.debug("Config mirror updated", extra={"version": self.version})
+        self.fetched_at = time.time()
+        self.refreshes += 1
+        
+        if changed and self.on_change is not None:
+            with self.local_write():
+                self.on_change(self.version)
+        return tree
+    
+    async def get_tree(self) -> Dict[str, Any]:
+        """
+        Get the configuration tree, refreshing it first if it is stale or too old.
+        
+        Returns:
+            The configuration tree
+        """
+        if self.is_fresh():
+            return self.tree
+        return await self.refresh()
+    
+    async def get(self, path_parts: List[str]) -> Tuple[bool, Any]:
+        """
+        Get the configuration at a path from the mirror.
+        
+        Args:
+            path_parts: Path parts from an API path
+        
+        Returns:
+            Tuple of (found, data)
+        """
+        tree = await self.get_tree()
+        self.slices += 1
+        return slice_tree(tree, normalize_path(path_parts))
+    
+    async def snapshot(self) -> ConfigSnapshot:
+        """
+        Get a snapshot of the mirrored configuration, reused until the version changes.
+        
+        Returns:
+            Snapshot of the current configuration tree
+        """
+        tree = await self.get_tree()
+        if self._snapshot is None or self._snapshot.version != self.version:
+            self._snapshot = ConfigSnapshot(tree, version=self.version)
+        return self._snapshot
+    
+    async def run(self) -> None:
+        """Refresh the mirror at background priority until cancelled."""
+        while True:
+            try:
+                await self.refresh(priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                logger.warning("Scheduled config mirror refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get mirror statistics.
+        
+        Returns:
+            Dictionary with the mirror version, age and counters
+        """
+        return {
+            "loaded": self.tree is not None,
+            "version": self.version,
+            "age": time.time() - self.fetched_at if self.tree is not None else None,
+            "stale": self.stale,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "slices": self.slices,
+            "writes": self.writes,
+            "drifts": self.drifts
+        }
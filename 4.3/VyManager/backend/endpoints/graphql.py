@@ -1,8 +1,11 @@
 from typing import Dict, Any, Optional
-import aiohttp
 from pydantic import BaseModel
 import json
-import ssl
+import logging
+import codec
+from utils import PRIORITY_READ
+
+logger = logging.getLogger(__name__)
 
 class GraphQLQuery(BaseModel):
     """Model for GraphQL query data"""
@@ -20,13 +23,7 @@ class GraphQLEndpoint:
         """
         self.client = client
         self.base_url = f"{'https' if client.https else 'http'}://{client.host}/graphql"
-        if client.trust_self_signed:
-            self.ssl_context = ssl.create_default_context()
-            self.ssl_context.check_hostname = False
-            self.ssl_context.verify_mode = ssl.CERT_NONE
-        else:
-            self.ssl_context = True
-        print(f"GraphQL endpoint initialized with base URL: {self.base_url}")
+        logger.debug("GraphQL endpoint initialized with base URL: %s", self.base_url)
     
     async def operation(self, name: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -72,8 +69,6 @@ class GraphQLEndpoint:
         Returns:
             Dict containing the query response
         """
-        print(f"Executing GraphQL query: {query}")
-        
         headers = {
             'Content-Type': 'application/json',
             'X-API-Key': self.client.api_key
@@ -84,30 +79,29 @@ class GraphQLEndpoint:
             "variables": {}
         }
         
-        print(f"GraphQL request payload: {payload}")
-        print(f"GraphQL request headers: {headers}")
+        # The query embeds the API key, so it is never logged
+        logger.debug("Executing GraphQL query", extra={"url": self.base_url})
         
         try:
-            async with aiohttp.ClientSession() as session:
+            session = await self.client.get_session()
+            async with self.client.scheduler.slot(PRIORITY_READ):
                 async with session.post(
                     self.base_url,
                     headers=headers,
-                    json=payload,
-                    ssl=self.ssl_context
+                    data=codec.dumps(payload)
                 ) as response:
-                    print(f"GraphQL response status: {response.status}")
+                    logger.debug("GraphQL response status: %s", response.status)
                     
                     if response.status != 200:
                         error_text = await response.text()
-                        print(f"GraphQL error response: {error_text}")
+                        logger.warning("GraphQL error response (HTTP %s): %s", response.status, error_text[:1000])
                         return {
                             "success": False,
                             "error": f"GraphQL request failed with status {response.status}",
                             "data": None
                         }
                     
-                    data = await response.json()
-                    print(f"GraphQL response data: {data}")
+                    data = codec.loads(await response.read())
                     
                     # Check for GraphQL errors
                     if data.get("errors"):
@@ -123,9 +117,7 @@ class GraphQLEndpoint:
                         "data": data.get("data")
                     }
         except Exception as e:
-            print(f"GraphQL query error: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("GraphQL query error: %s", e)
             return {
                 "success": False,
                 "error": str(e),
@@ -0,0 +1,140 @@
+import json
+import logging
+import logging.handlers
+import os
+import random
+import sys
+from typing import Dict, Optional
+
+# Attributes present on every LogRecord; anything else was passed through `extra`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, object]:
+    """
+    Get the structured fields attached to a log record via `extra`.
+
+    Args:
+        record: The log record
+
+    Returns:
+        Dictionary of extra fields
+    """
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable formatter that appends structured fields as key=value pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """Formatter that writes one JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Filter that lets through only a random sample of DEBUG records.
+
+    Records at INFO and above always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    """
+    Parse per-module log levels.
+
+    Args:
+        spec: Comma-separated logger=level pairs, e.g. "client=debug,utils=warning"
+
+    Returns:
+        Mapping of logger name to level
+    """
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        level_value = logging.getLevelName(level.strip().upper())
+        if isinstance(level_value, int):
+            levels[name.strip()] = level_value
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    log_format: Optional[str] = None,
+    debug_sample_rate: Optional[float] = None,
+    log_file: Optional[str] = None,
+) -> None:
+    """
+    Configure application logging.
+
+    Unset arguments are read from the environment: LOG_LEVEL, LOG_LEVELS,
+    LOG_FORMAT ("text" or "json"), LOG_DEBUG_SAMPLE_RATE and BACKEND_LOG.
+
+    Args:
+        level: Root log level name (default: info)
+        module_levels: Per-module levels, e.g. "client=debug,utils=warning"
+        log_format: Output format, "text" or "json" (default: text)
+        debug_sample_rate: Fraction of DEBUG records to keep, between 0 and 1 (default: 1)
+        log_file: Optional file to write logs to in addition to stderr
+    """
+    level = (level or os.getenv("LOG_LEVEL", "info")).upper()
+    module_levels = module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+    log_format = (log_format or os.getenv("LOG_FORMAT", "text")).lower()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1))
+    log_file = log_file if log_file is not None else os.getenv("BACKEND_LOG", "")
+
+    if log_format == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.handlers.WatchedFileHandler(log_file))
+
+    sampler = DebugSampler(debug_sample_rate)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(sampler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+    for name, module_level in _parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
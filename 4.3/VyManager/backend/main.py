@@ -1,31 +1,40 @@
 from fastapi import FastAPI, Request, APIRouter, HTTPException, Query, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
+import re
 import pathlib
+import sqlite3
 import traceback
 from typing import Optional, List, Dict, Any, Callable, Awaitable
 import urllib.parse
 from dotenv import load_dotenv
 import asyncio
+import logging
 import uvicorn
 import datetime
 from functools import lru_cache
+from contextlib import nullcontext
 
 # Import the VyOS API wrapper
 from client import VyOSClient
-from utils import VyOSAPIError, merge_cidr_parts
-from cache import cache, cached, invalidate_cache
-
-# Application state
-UNSAVED_CHANGES = False
+from utils import VyOSAPIError, merge_cidr_parts, OUTCOME_UNKNOWN
+from cache import cache, cached, invalidate_cache, invalidate_path, CachedResponse, ConditionalGetMiddleware, KEY_SEPARATOR, SQLiteBackend
+from config_tree import ConfigMirror, ConfigSnapshot, diff_snapshots, normalize_path, project_tree
+import codec
+from codec import FastJSONResponse, EncodedJSONResponse
+from logging_config import setup_logging
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Configure logging (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, BACKEND_LOG)
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Directory configuration
 BASE_DIR = pathlib.Path(__file__).parent
 STATIC_DIR = BASE_DIR / "static"
@@ -47,16 +56,68 @@ CERT_PATH = os.getenv("CERT_PATH", "")
 TRUST_SELF_SIGNED = os.getenv("TRUST_SELF_SIGNED", "false").lower() == "true"
 HTTPS = os.getenv("VYOS_HTTPS", "true").lower() == "true"
 
-# Debug: Print the actual environment variables being used
-print(f"DEBUG: Using VYOS_HOST={VYOS_HOST}")
-print(f"DEBUG: Using API_KEY={API_KEY}")
+# Connection pool settings
+VYOS_POOL_SIZE = int(os.getenv("VYOS_POOL_SIZE", 10))
+VYOS_KEEPALIVE_TIMEOUT = float(os.getenv("VYOS_KEEPALIVE_TIMEOUT", 30))
+VYOS_MAX_CONCURRENCY = int(os.getenv("VYOS_MAX_CONCURRENCY", 4))
+
+# Timeout, retry and circuit breaker settings
+VYOS_REQUEST_TIMEOUT = float(os.getenv("VYOS_REQUEST_TIMEOUT", 30))
+VYOS_MAX_RETRIES = int(os.getenv("VYOS_MAX_RETRIES", 2))
+VYOS_BREAKER_THRESHOLD = int(os.getenv("VYOS_BREAKER_THRESHOLD", 5))
+VYOS_BREAKER_RESET_TIMEOUT = float(os.getenv("VYOS_BREAKER_RESET_TIMEOUT", 30))
+
+# Response decoding settings
+VYOS_STREAM_DECODE_THRESHOLD = int(os.getenv("VYOS_STREAM_DECODE_THRESHOLD", 8 * 1024 * 1024))
+VYOS_DEBUG_RESPONSES = os.getenv("VYOS_DEBUG_RESPONSES", "false").lower() == "true"
+
+# Write-combining settings for individual configure calls
+CONFIGURE_BATCH_WRITES = os.getenv("CONFIGURE_BATCH_WRITES", "false").lower() == "true"
+CONFIGURE_BATCH_WINDOW_MS = int(os.getenv("CONFIGURE_BATCH_WINDOW_MS", 50))
+
+# Response cache backend and bounds ('memory' per process, or 'sqlite' shared by all workers)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+# The shared cache file is kept in a directory only VyManager can write to, never in /tmp
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR") or str(BASE_DIR / "data"), "vymanager-cache.sqlite3")
+)
+CACHE_INVALIDATION_POLL_MS = int(os.getenv("CACHE_INVALIDATION_POLL_MS", 500))
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", 30))
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "")
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", 2000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 128 * 1024 * 1024))
+if CACHE_BACKEND == "sqlite":
+    try:
+        cache.use_backend(SQLiteBackend(CACHE_SQLITE_PATH, response_type=CachedResponse))
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Cannot use the shared cache file %s, using the in-memory cache: %s", CACHE_SQLITE_PATH, e)
+elif CACHE_BACKEND != "memory":
+    logger.warning("Unknown CACHE_BACKEND %r, using the in-memory cache", CACHE_BACKEND)
+cache.configure(max_items=CACHE_MAX_ITEMS, max_bytes=CACHE_MAX_BYTES)
+
+# Stale serving for operational data that is slow to fetch
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 300))
+CACHE_STALE_IF_ERROR = int(os.getenv("CACHE_STALE_IF_ERROR", 3600))
+
+# In-memory copy of the running config that answers /api/config subtree reads
+CONFIG_MIRROR_ENABLED = os.getenv("CONFIG_MIRROR_ENABLED", "true").lower() == "true"
+CONFIG_MIRROR_REFRESH_INTERVAL = float(os.getenv("CONFIG_MIRROR_REFRESH_INTERVAL", 240))
+CONFIG_MIRROR_MAX_AGE = float(os.getenv("CONFIG_MIRROR_MAX_AGE", 300))
+CONFIG_MIRROR_VERIFY_DELAY = float(os.getenv("CONFIG_MIRROR_VERIFY_DELAY", 2))
+
+# Stored config snapshots that /api/config/diff can compare
+CONFIG_SNAPSHOT_LIMIT = int(os.getenv("CONFIG_SNAPSHOT_LIMIT", 20))
+
+# Log the router being used (never the API key)
+logger.info("Using VYOS_HOST=%s", VYOS_HOST)
 
 # Extract host from VYOS_API_URL if VYOS_HOST is not set
 if not VYOS_HOST and VYOS_API_URL:
     try:
         parsed_url = urllib.parse.urlparse(VYOS_API_URL)
         VYOS_HOST = parsed_url.netloc
-        print(f"DEBUG: Extracted VYOS_HOST from API URL: {VYOS_HOST}")
+        logger.info("Extracted VYOS_HOST from API URL: %s", VYOS_HOST)
     except Exception:
         pass
 
@@ -64,34 +125,55 @@ if not VYOS_HOST and VYOS_API_URL:
 vyos_client = None
 if VYOS_HOST and API_KEY:
     try:
-        print(f"DEBUG: Initializing VyOSClient with host={VYOS_HOST} and API_KEY={API_KEY}")
         vyos_client = VyOSClient(
             host=VYOS_HOST,
             api_key=API_KEY,
             https=HTTPS,
             cert_path=CERT_PATH,
-            trust_self_signed=TRUST_SELF_SIGNED
+            trust_self_signed=TRUST_SELF_SIGNED,
+            pool_size=VYOS_POOL_SIZE,
+            keepalive_timeout=VYOS_KEEPALIVE_TIMEOUT,
+            write_window=CONFIGURE_BATCH_WINDOW_MS / 1000,
+            max_concurrency=VYOS_MAX_CONCURRENCY,
+            request_timeout=VYOS_REQUEST_TIMEOUT,
+            max_retries=VYOS_MAX_RETRIES,
+            breaker_threshold=VYOS_BREAKER_THRESHOLD,
+            breaker_reset_timeout=VYOS_BREAKER_RESET_TIMEOUT,
+            stream_threshold=VYOS_STREAM_DECODE_THRESHOLD,
+            debug_responses=VYOS_DEBUG_RESPONSES
         )
         
         # Test connection in background after startup
         async def test_connection():
             try:
-                print(f"DEBUG: Testing connection with API_KEY={API_KEY}")
                 success, error_msg = await vyos_client.test_connection()
                 if not success:
-                    print(f"CRITICAL: Connection test failed - {error_msg}")
+                    logger.critical("Connection test failed - %s", error_msg)
             except Exception as e:
-                print(f"CRITICAL: Connection test to VyOS router failed: {e}")
+                logger.critical("Connection test to VyOS router failed: %s", e)
                 
     except Exception as e:
-        print(f"CRITICAL ERROR: Failed to initialize VyOS client: {e}")
+        logger.critical("Failed to initialize VyOS client: %s", e)
 else:
     missing = []
     if not VYOS_HOST:
         missing.append("VYOS_HOST")
     if not API_KEY:
         missing.append("VYOS_API_KEY")
-    print(f"CRITICAL ERROR: Cannot initialize VyOS client - missing required configuration: {', '.join(missing)}")
+    logger.critical("Cannot initialize VyOS client - missing required configuration: %s", ", ".join(missing))
+
+# Config mirror, kept in step with config cache invalidations from this and other workers
+config_mirror = None
+if vyos_client and CONFIG_MIRROR_ENABLED:
+    config_mirror = ConfigMirror(
+        vyos_client,
+        refresh_interval=CONFIG_MIRROR_REFRESH_INTERVAL,
+        max_age=CONFIG_MIRROR_MAX_AGE,
+        verify_delay=CONFIG_MIRROR_VERIFY_DELAY
+    )
+    cache.add_invalidation_listener(config_mirror.invalidate)
+    # A refresh that finds changes made outside VyManager outdates the cached config responses
+    config_mirror.on_change = lambda version: invalidate_config_path(None)
 
 # Create FastAPI app
 app = FastAPI(
@@ -101,6 +183,7 @@ app = FastAPI(
     docs_url=None if IS_PRODUCTION else "/docs",
     redoc_url=None if IS_PRODUCTION else "/redoc",
     openapi_url="/openapi.json",
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -110,10 +193,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["Content-Type", "Authorization", "X-Requested-With", "X-CSRF-Token"],
-    expose_headers=["Content-Length", "Content-Type"],
+    expose_headers=["Content-Length", "Content-Type", "ETag"],
     max_age=86400,
 )
 
+# Answer polls of unchanged cached data with 304 Not Modified
+app.add_middleware(
+    ConditionalGetMiddleware,
+    paths=("/api/config", "/api/routingtable", "/api/dhcp/leases"),
+)
+
 # Create API router
 api_router = APIRouter(prefix="/api")
 
@@ -170,11 +259,196 @@ def get_cache_key(endpoint_type: str, path_parts: Optional[List[str]] = None) ->
         return f"dynamic:{endpoint_type}:{':'.join([str(p) for p in path_parts])}"
     return f"dynamic:{endpoint_type}"
 
+# Operational cache prefixes that a change under each top-level config section can affect
+CONFIG_CACHE_DEPENDENCIES: Dict[str, List[str]] = {
+    "interfaces": ["show:interfaces", "show:ip", "show:ipv6", "show:arp", "show:lldp", "routing_table"],
+    "protocols": ["show:ip", "show:ipv6", "show:bgp", "show:ospf", "show:protocols", "routing_table"],
+    "vrf": ["show:vrf", "show:ip", "show:ipv6", "routing_table"],
+    "policy": ["show:policy", "show:ip", "show:ipv6", "routing_table"],
+    "firewall": ["show:firewall"],
+    "nat": ["show:nat"],
+    "service": ["show:dhcp", "show:dhcpv6", "show:dns", "show:ntp", "show:service", "dhcp_leases"],
+    "vpn": ["show:vpn"],
+    "system": ["show:system", "show:ntp"],
+    "high-availability": ["show:vrrp"],
+}
+
+# Sections without a known mapping may affect any operational data
+DEFAULT_CACHE_DEPENDENCIES = ["show", "routing_table", "dhcp_leases"]
+
+def split_api_path(path: str) -> List[str]:
+    """Split a '/'-separated API path into VyOS path parts, keeping CIDR prefixes together"""
+    path_parts = merge_cidr_parts(path.split("/"))
+    return [part for part in path_parts if part]
+
+def path_cache_key(path: str = "", **kwargs) -> str:
+    """Cache key suffix for a config or show path, e.g. 'interfaces:ethernet:eth1'"""
+    return KEY_SEPARATOR.join(split_api_path(path))
+
+def parse_config_fields(fields: Optional[List[str]]) -> List[List[str]]:
+    """Parse projection fields, given repeated or comma-separated, into normalized config paths"""
+    paths = []
+    for value in fields or []:
+        for field in value.split(","):
+            path_parts = split_api_path(field.strip())
+            if path_parts:
+                paths.append(normalize_path(path_parts))
+    return paths
+
+def projection_cache_key(path: str = "", fields: Optional[List[str]] = None, depth: Optional[int] = None, **kwargs) -> str:
+    """Cache key suffix for a projected config read, e.g. 'interfaces:fields=ethernet,wireguard:depth=2'"""
+    selected = sorted({"/".join(field) for field in parse_config_fields(fields)})
+    return KEY_SEPARATOR.join([path_cache_key(path), "fields=" + ",".join(selected), f"depth={depth}"])
+
+def fixed_cache_key(*args, **kwargs) -> str:
+    """Cache key suffix for endpoints whose result does not depend on their arguments"""
+    return ""
+
+def invalidate_config_path(path_parts: Optional[List[str]]) -> None:
+    """
+    Invalidate the cached data a configuration change at a path can affect.
+    
+    Args:
+        path_parts: Config path that was set, deleted or commented (None or empty for the whole config)
+    """
+    path_parts = [str(part) for part in path_parts or [] if part]
+    if not path_parts:
+        invalidate_cache(pattern="config")
+        dependencies = DEFAULT_CACHE_DEPENDENCIES
+    else:
+        invalidate_path("config", path_parts)
+        dependencies = CONFIG_CACHE_DEPENDENCIES.get(path_parts[0], DEFAULT_CACHE_DEPENDENCIES)
+    # Projections can include any part of the tree
+    invalidate_cache(pattern="config_view")
+    
+    for prefix in dependencies:
+        invalidate_cache(pattern=prefix)
+        # The dynamic handler caches show output under its own keys
+        if prefix.split(KEY_SEPARATOR)[0] == "show":
+            invalidate_cache(pattern=f"dynamic:{prefix}")
+
+def invalidate_config_write(op: str, path_parts: Optional[List[str]]) -> None:
+    """
+    Invalidate the caches a configuration write can affect.
+    
+    Called before the write is sent and again by apply_config_write() once
+    it completes. The config mirror stays fresh; apply_config_write()
+    updates it once the write succeeds.
+    
+    Args:
+        op: Operation, "set", "delete" or "comment"
+        path_parts: Config path being written
+    """
+    with config_mirror.local_write() if config_mirror else nullcontext():
+        if op == "comment":
+            # Comments only change the config tree, not operational data
+            invalidate_path("config", path_parts)
+        else:
+            invalidate_config_path(path_parts)
+
+def write_outcome(response) -> Optional[bool]:
+    """
+    Check whether the router accepted a configuration write.
+    
+    VyOS rejects invalid paths with HTTP 200 and "success": false, so the
+    decoded result decides, not only the status code. Failures where the
+    router may have applied the write anyway are marked with
+    "outcome": OUTCOME_UNKNOWN.
+    
+    Args:
+        response: Response returned for the write
+        
+    Returns:
+        True if the write was applied, False if the router rejected it,
+        None if the outcome is unknown (the request failed)
+    """
+    if response.status_code >= 400:
+        return None
+    try:
+        result = codec.loads(response.body)
+    except ValueError:
+        return None
+    return result_outcome(result)
+
+def result_outcome(result: Any) -> Optional[bool]:
+    """
+    Check whether the router accepted a configuration write from its decoded result.
+    
+    Args:
+        result: Decoded result of the write
+        
+    Returns:
+        True if the write was applied, False if the router rejected it,
+        None if the outcome is unknown
+    """
+    if not isinstance(result, dict):
+        return True
+    if result.get("outcome") == OUTCOME_UNKNOWN:
+        return None
+    return result.get("success") is not False
+
+def apply_config_write(op: str, path_parts: List[str], succeeded: Optional[bool]) -> None:
+    """
+    Update the config mirror and caches after a configuration write.
+    
+    Reads served while the write was in flight may have cached the old
+    configuration, so its caches are invalidated again unless the router
+    rejected it.
+    
+    Args:
+        op: Operation, "set", "delete" or "comment"
+        path_parts: Config path that was written
+        succeeded: True if the router applied the write, False if it rejected
+            it (nothing changed), None if the outcome is unknown
+    """
+    if succeeded is False:
+        # Nothing changed, so reads during the write were served correctly
+        return
+    if config_mirror:
+        if succeeded:
+            config_mirror.apply(op, path_parts)
+        else:
+            # The router state is unknown after a failed request
+            config_mirror.invalidate()
+    invalidate_config_write(op, path_parts)
+
+def encode_and_cache(content: Any, cache_key: Optional[str] = None, ttl: int = 300) -> FastJSONResponse:
+    """
+    Encode a JSON result once and optionally cache the encoded bytes.
+    
+    Args:
+        content: JSON-serializable result
+        cache_key: Key to cache the encoded response under (default: not cached)
+        ttl: Cache time to live in seconds
+        
+    Returns:
+        Response sending the encoded body
+    """
+    # Encoding also verifies JSON serialization
+    try:
+        body = codec.dumps(content)
+    except (TypeError, ValueError, OverflowError) as e:
+        return FastJSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "error": f"Response contains non-serializable data: {str(e)}",
+                "raw_data": str(content)[:1000] if content else None
+            }
+        )
+    
+    if not cache_key:
+        return EncodedJSONResponse(content=body)
+    
+    encoded = CachedResponse(body)
+    cache.set(cache_key, encoded, ttl=ttl, size=len(body))
+    return encoded.to_response()
+
 # Dynamic API endpoint handler
-async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List[str]] = None) -> JSONResponse:
+async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List[str]] = None, combine_writes: bool = False) -> FastJSONResponse:
     """Dynamically route API requests to the appropriate VyOS API method"""
     if not vyos_client:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=503,
             content={
                 "success": False,
@@ -189,8 +463,8 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
     if read_only:
         cache_key = get_cache_key(endpoint_type, path_parts)
         cached_result = cache.get(cache_key)
-        if cached_result:
-            return JSONResponse(content=cached_result)
+        if isinstance(cached_result, CachedResponse):
+            return cached_result.to_response()
     
     try:
         # Get the appropriate client method based on endpoint_type
@@ -210,7 +484,7 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
         
         method = method_map.get(endpoint_type)
         if not method:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=400,
                 content={"success": False, "error": f"Unknown endpoint type: {endpoint_type}"}
             )
@@ -218,7 +492,11 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
         # Execute the method with the path parts
         if path_parts:
             if endpoint_type.startswith("configure_"):
-                result = await method(path_parts)
+                if combine_writes:
+                    op = endpoint_type[len("configure_"):]
+                    result = await vyos_client.write_combiner.submit(op, path_parts)
+                else:
+                    result = await method(path_parts)
             else:
                 try:
                     curr_method = method
@@ -239,15 +517,10 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
                 if isinstance(result, str):
                     if result.strip().startswith('{') or result.strip().startswith('['):
                         try:
-                            parsed_result = json.loads(result)
-                            
-                            # Cache read-only results
-                            if read_only:
-                                cache.set(cache_key, parsed_result, ttl=300)
-                                
-                            return JSONResponse(content=parsed_result)
+                            parsed_result = codec.loads(result)
+                            return encode_and_cache(parsed_result, cache_key if read_only else None)
                         except json.JSONDecodeError:
-                            return JSONResponse(
+                            return FastJSONResponse(
                                 status_code=500,
                                 content={
                                     "success": False,
@@ -257,22 +530,12 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
                             )
                     else:
                         response_data = {"success": True, "data": result, "error": None}
-                        
-                        # Cache read-only results
-                        if read_only:
-                            cache.set(cache_key, response_data, ttl=300)
-                            
-                        return JSONResponse(content=response_data)
+                        return encode_and_cache(response_data, cache_key if read_only else None)
                 else:
                     response_data = {"success": True, "data": str(result), "error": None}
-                    
-                    # Cache read-only results
-                    if read_only:
-                        cache.set(cache_key, response_data, ttl=300)
-                        
-                    return JSONResponse(content=response_data)
+                    return encode_and_cache(response_data, cache_key if read_only else None)
             except Exception as e:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=500,
                     content={
                         "success": False,
@@ -281,30 +544,10 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
                     }
                 )
         
-        # Cache read-only results
-        if read_only:
-            try:
-                json.dumps(result)  # Verify serialization
-                cache.set(cache_key, result, ttl=300)
-            except (TypeError, ValueError):
-                pass  # Skip caching if not serializable
-        
-        # Verify JSON serialization
-        try:
-            json.dumps(result)
-            return JSONResponse(content=result)
-        except (TypeError, ValueError, OverflowError) as e:
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "success": False,
-                    "error": f"Response contains non-serializable data: {str(e)}",
-                    "raw_data": str(result)[:1000] if result else None
-                }
-            )
+        return encode_and_cache(result, cache_key if read_only else None)
         
     except VyOSAPIError as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"success": False, "error": f"VyOS API Error: {e.message}"}
         )
@@ -312,39 +555,270 @@ async def dynamic_vyos_api_handler(endpoint_type: str, path_parts: Optional[List
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
+
+# Unsaved changes flag, kept in the cache backend so all workers share it
+def get_unsaved_changes() -> bool:
+    return bool(cache.get_state("unsaved_changes", False))
+
+def set_unsaved_changes(value: bool) -> None:
+    cache.set_state("unsaved_changes", value)
+
+# Config snapshots, kept in the cache backend so all workers share them.
+# "running" is the live config and "saved" is taken when the config file is saved.
+RUNNING_CONFIG = "running"
+DEFAULT_CONFIG_FILE = "/config/config.boot"
+SAVED_CONFIG = "saved"
+SNAPSHOT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+parsed_snapshots: Dict[str, ConfigSnapshot] = {}
+
+def list_config_snapshots() -> Dict[str, Dict[str, Any]]:
+    return cache.get_state("config_snapshots", {})
+
+def store_config_snapshot(name: str, snapshot: ConfigSnapshot) -> None:
+    """
+    Store a config snapshot under a name, dropping the oldest ones over the limit.
+    
+    Args:
+        name: Snapshot name
+        snapshot: Snapshot to store
+    """
+    cache.set_state(f"config_snapshot:{name}", {
+        "tree": snapshot.tree,
+        "version": snapshot.version,
+        "created": snapshot.created
+    })
+    index = dict(list_config_snapshots())
+    index[name] = {"version": snapshot.version, "created": snapshot.created}
+    
+    # The saved snapshot is never dropped for space
+    named = sorted((info["created"], other) for other, info in index.items() if other != SAVED_CONFIG)
+    while len(named) > CONFIG_SNAPSHOT_LIMIT:
+        _, oldest = named.pop(0)
+        del index[oldest]
+        cache.delete_state(f"config_snapshot:{oldest}")
+        parsed_snapshots.pop(oldest, None)
+    cache.set_state("config_snapshots", index)
+
+def delete_config_snapshot(name: str) -> bool:
+    index = dict(list_config_snapshots())
+    if name not in index:
+        return False
+    del index[name]
+    cache.set_state("config_snapshots", index)
+    cache.delete_state(f"config_snapshot:{name}")
+    parsed_snapshots.pop(name, None)
+    return True
+
+def load_config_snapshot(name: str) -> Optional[ConfigSnapshot]:
+    """
+    Load a stored config snapshot, reusing its hashes while it is unchanged.
+    
+    Args:
+        name: Snapshot name
+        
+    Returns:
+        The snapshot, or None if there is none under the name
+    """
+    info = list_config_snapshots().get(name)
+    if info is None:
+        return None
+    snapshot = parsed_snapshots.get(name)
+    if snapshot is not None and snapshot.created == info["created"]:
+        return snapshot
+    
+    stored = cache.get_state(f"config_snapshot:{name}")
+    if not stored:
+        return None
+    snapshot = ConfigSnapshot(stored["tree"], version=stored["version"], created=stored["created"])
+    parsed_snapshots[name] = snapshot
+    return snapshot
+
+async def running_config_snapshot() -> ConfigSnapshot:
+    """
+    Get a snapshot of the running config.
+    
+    Raises:
+        RuntimeError: If the router did not return a configuration
+    """
+    if config_mirror:
+        return await config_mirror.snapshot()
+    result = await vyos_client.showConfig()
+    if not isinstance(result, dict) or not result.get("success") or not isinstance(result.get("data"), dict):
+        error = result.get("error") if isinstance(result, dict) else None
+        raise RuntimeError(error or "Router returned no configuration")
+    return ConfigSnapshot(result["data"])
+
+async def resolve_config_state(name: str) -> Optional[ConfigSnapshot]:
+    """
+    Get the config state a name refers to: "running", "saved" or a stored snapshot.
+    
+    Args:
+        name: Config state name
+        
+    Returns:
+        The snapshot, or None if there is no such state
+    """
+    if name == RUNNING_CONFIG:
+        return await running_config_snapshot()
+    snapshot = load_config_snapshot(name)
+    if snapshot is None and name == SAVED_CONFIG and not get_unsaved_changes():
+        # Nothing changed since the last save, so the running config is the saved one
+        return await running_config_snapshot()
+    return snapshot
 
 # API Routes for unsaved changes state management
 @api_router.get("/check-unsaved-changes")
 async def api_check_unsaved():
     """Returns whether there are unsaved changes"""
-    return JSONResponse(content={
+    return FastJSONResponse(content={
         "success": True,
-        "data": UNSAVED_CHANGES,
+        "data": get_unsaved_changes(),
         "error": None
     })
 
 @api_router.post("/set-unsaved-changes/{value}")
 async def api_set_unsaved_changes(value: bool):
     """Set whether there are unsaved changes"""
-    global UNSAVED_CHANGES
-    UNSAVED_CHANGES = value
-    return JSONResponse(content={"success": True, "error": None})
+    set_unsaved_changes(value)
+    return FastJSONResponse(content={"success": True, "error": None})
 
 # API Routes for 'show' operations
 @api_router.get("/show/{path:path}")
-@cached(ttl=300, key_prefix="show")
+@cached(ttl=300, key_prefix="show", key_func=path_cache_key)
 async def api_show(path: str):
     """Handle 'show' operation API calls with dynamic paths"""
     path_parts = path.split("/")
     path_parts = merge_cidr_parts(path_parts)
     return await dynamic_vyos_api_handler("show", path_parts)
 
+# Config diff and snapshot routes, registered before the config path route that would match them
+@api_router.get("/config/diff")
+async def api_config_diff(source: str = SAVED_CONFIG, target: str = RUNNING_CONFIG):
+    """Compare two config states ("running", "saved" or a snapshot name) as set/delete commands"""
+    if not vyos_client:
+        return FastJSONResponse(
+            status_code=503,
+            content={"success": False, "error": "VyOS client not initialized. Check your environment variables."}
+        )
+    
+    try:
+        states = {}
+        for name in (source, target):
+            snapshot = await resolve_config_state(name)
+            if snapshot is None:
+                error = f"Unknown config state: '{name}'"
+                if name == SAVED_CONFIG:
+                    error = "The saved config is not known until the config file is saved"
+                return FastJSONResponse(status_code=404, content={"success": False, "error": error, "data": None})
+            states[name] = snapshot
+        
+        old, new = states[source], states[target]
+        diff = diff_snapshots(old, new)
+        return FastJSONResponse(content={
+            "success": True,
+            "data": {
+                "source": {"name": source, "version": old.version, "created": old.created},
+                "target": {"name": target, "version": new.version, "created": new.created},
+                "identical": old.root_hash == new.root_hash,
+                **diff
+            },
+            "error": None
+        })
+    except Exception as e:
+        error_response = {"success": False, "error": f"Error communicating with VyOS router: {str(e)}", "data": None}
+        if not IS_PRODUCTION:
+            error_response["traceback"] = traceback.format_exc()
+        return FastJSONResponse(status_code=500, content=error_response)
+
+@api_router.get("/config/snapshots")
+async def api_config_snapshots():
+    """List the stored config snapshots"""
+    return FastJSONResponse(content={"success": True, "data": list_config_snapshots(), "error": None})
+
+@api_router.post("/config/snapshots/{name}")
+async def api_config_snapshot_create(name: str):
+    """Store a snapshot of the running config under a name"""
+    if not vyos_client:
+        return FastJSONResponse(
+            status_code=503,
+            content={"success": False, "error": "VyOS client not initialized. Check your environment variables."}
+        )
+    # Both names are reserved: "running" is the live config and "saved" is taken on config file save
+    if name in (RUNNING_CONFIG, SAVED_CONFIG) or not SNAPSHOT_NAME_PATTERN.match(name):
+        return FastJSONResponse(
+            status_code=400,
+            content={"success": False, "error": f"Invalid snapshot name: '{name}'"}
+        )
+    
+    try:
+        snapshot = await running_config_snapshot()
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=500,
+            content={"success": False, "error": f"Error communicating with VyOS router: {str(e)}"}
+        )
+    store_config_snapshot(name, snapshot)
+    return FastJSONResponse(content={
+        "success": True,
+        "data": {"name": name, "version": snapshot.version, "created": snapshot.created},
+        "error": None
+    })
+
+@api_router.delete("/config/snapshots/{name}")
+async def api_config_snapshot_delete(name: str):
+    """Delete a stored config snapshot"""
+    if not delete_config_snapshot(name):
+        return FastJSONResponse(
+            status_code=404,
+            content={"success": False, "error": f"Unknown snapshot: '{name}'"}
+        )
+    return FastJSONResponse(content={"success": True, "error": None})
+
 # API Routes for 'showConfig' operations
 @api_router.get("/config/{path:path}")
-@cached(ttl=300, key_prefix="config")
-async def api_config(path: str = "", client: VyOSClient = Depends(get_vyos_client)):
-    """Handle configuration retrieval API calls with dynamic paths"""
+async def api_config(
+    path: str = "",
+    fields: Optional[List[str]] = Query(None, description="Subtree paths to return, e.g. firewall,interfaces/ethernet"),
+    depth: Optional[int] = Query(None, ge=0, description="Levels of the tree to return below the path or each field"),
+    client: VyOSClient = Depends(get_vyos_client)
+):
+    """Handle configuration retrieval API calls with dynamic paths, optionally projected"""
+    if fields or depth is not None:
+        return await config_projection(path=path, fields=fields, depth=depth, client=client)
+    return await config_subtree(path=path, client=client)
+
+@cached(ttl=300, key_prefix="config_view", key_func=projection_cache_key)
+async def config_projection(path: str, fields: Optional[List[str]], depth: Optional[int], client: VyOSClient):
+    """Get the parts of the configuration at a path selected by fields and depth"""
+    field_paths = parse_config_fields(fields)
+    if config_mirror:
+        try:
+            found, data = await config_mirror.get(split_api_path(path))
+            if found:
+                return encode_and_cache({"success": True, "data": project_tree(data, field_paths, depth), "error": None})
+        except Exception as e:
+            logger.warning("Config mirror unavailable, querying the router: %s", e)
+    
+    response = await config_subtree(path=path, client=client)
+    if response.status_code != 200:
+        return response
+    result = codec.loads(response.body)
+    result["data"] = project_tree(result.get("data"), field_paths, depth)
+    return encode_and_cache(result)
+
+@cached(ttl=300, key_prefix="config", key_func=path_cache_key)
+async def config_subtree(path: str, client: VyOSClient):
+    """Get the configuration at a path"""
+    if config_mirror:
+        try:
+            found, data = await config_mirror.get(split_api_path(path))
+            if found:
+                return encode_and_cache({"success": True, "data": data, "error": None})
+        except Exception as e:
+            logger.warning("Config mirror unavailable, querying the router: %s", e)
+        # Paths missing from the mirror get the router's own error response
+    
     try:
         if not path:
             method = client.showConfig
@@ -358,7 +832,7 @@ async def api_config(path: str = "", client: VyOSClient = Depends(get_vyos_clien
                 try:
                     method = getattr(method, part)
                 except AttributeError:
-                    return JSONResponse(
+                    return FastJSONResponse(
                         status_code=400,
                         content={
                             "success": False,
@@ -369,12 +843,11 @@ async def api_config(path: str = "", client: VyOSClient = Depends(get_vyos_clien
         
         result = await method()
         
-        # Verify JSON serialization
+        # Encode once, which also verifies JSON serialization
         try:
-            json.dumps(result)
-            return JSONResponse(content=result)
+            body = codec.dumps(result)
         except (TypeError, ValueError, OverflowError) as e:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=500,
                 content={
                     "success": False,
@@ -383,8 +856,10 @@ async def api_config(path: str = "", client: VyOSClient = Depends(get_vyos_clien
                 }
             )
         
+        return EncodedJSONResponse(content=body)
+        
     except VyOSAPIError as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"success": False, "error": f"VyOS API Error: {e.message}", "data": None}
         )
@@ -398,11 +873,11 @@ async def api_config(path: str = "", client: VyOSClient = Depends(get_vyos_clien
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
             
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # Configure operations
 @api_router.post("/configure/set/{path:path}")
-async def api_configure_set(path: str, value: Optional[str] = None):
+async def api_configure_set(path: str, value: Optional[str] = None, batch: Optional[bool] = None):
     """Handle 'set' configuration operations"""
     if '%2F' in path:
         path = urllib.parse.unquote(path)
@@ -414,17 +889,18 @@ async def api_configure_set(path: str, value: Optional[str] = None):
     if value:
         path_parts.append(value)
     
-    global UNSAVED_CHANGES
-    UNSAVED_CHANGES = True
+    set_unsaved_changes(True)
     
-    # Invalidate relevant caches when modifying configuration
-    invalidate_cache(pattern="config")
-    invalidate_cache(pattern="show")
+    # Invalidate the caches this change can affect
+    invalidate_config_write("set", path_parts)
     
-    return await dynamic_vyos_api_handler("configure_set", path_parts)
+    combine_writes = CONFIGURE_BATCH_WRITES if batch is None else batch
+    response = await dynamic_vyos_api_handler("configure_set", path_parts, combine_writes)
+    apply_config_write("set", path_parts, write_outcome(response))
+    return response
 
 @api_router.post("/configure/delete/{path:path}")
-async def api_configure_delete(path: str, value: Optional[str] = None):
+async def api_configure_delete(path: str, value: Optional[str] = None, batch: Optional[bool] = None):
     """Handle 'delete' configuration operations"""
     if '%2F' in path:
         path = urllib.parse.unquote(path)
@@ -436,17 +912,18 @@ async def api_configure_delete(path: str, value: Optional[str] = None):
     if value:
         path_parts.append(value)
 
-    global UNSAVED_CHANGES
-    UNSAVED_CHANGES = True
+    set_unsaved_changes(True)
     
-    # Invalidate relevant caches when modifying configuration
-    invalidate_cache(pattern="config")
-    invalidate_cache(pattern="show")
+    # Invalidate the caches this change can affect
+    invalidate_config_write("delete", path_parts)
     
-    return await dynamic_vyos_api_handler("configure_delete", path_parts)
+    combine_writes = CONFIGURE_BATCH_WRITES if batch is None else batch
+    response = await dynamic_vyos_api_handler("configure_delete", path_parts, combine_writes)
+    apply_config_write("delete", path_parts, write_outcome(response))
+    return response
 
 @api_router.post("/configure/comment/{path:path}")
-async def api_configure_comment(path: str, value: Optional[str] = None):
+async def api_configure_comment(path: str, value: Optional[str] = None, batch: Optional[bool] = None):
     """Handle 'comment' configuration operations"""
     if '%2F' in path:
         path = urllib.parse.unquote(path)
@@ -458,24 +935,21 @@ async def api_configure_comment(path: str, value: Optional[str] = None):
     if value:
         path_parts.append(value)
         
-    global UNSAVED_CHANGES
-    UNSAVED_CHANGES = True
+    set_unsaved_changes(True)
     
-    # Invalidate relevant caches when modifying configuration
-    invalidate_cache(pattern="config")
+    invalidate_config_write("comment", path_parts)
     
-    return await dynamic_vyos_api_handler("configure_comment", path_parts)
+    combine_writes = CONFIGURE_BATCH_WRITES if batch is None else batch
+    response = await dynamic_vyos_api_handler("configure_comment", path_parts, combine_writes)
+    apply_config_write("comment", path_parts, write_outcome(response))
+    return response
 
 @api_router.post("/configure/batch")
 async def api_configure_batch(operations: List[Dict[str, Any]], client: VyOSClient = Depends(get_vyos_client)):
     """Handle batch configuration operations"""
-    global UNSAVED_CHANGES
-    UNSAVED_CHANGES = True
-    
-    # Invalidate relevant caches when modifying configuration
-    invalidate_cache(pattern="config")
-    invalidate_cache(pattern="show")
+    set_unsaved_changes(True)
     
+    applied = []
     try:
         batch = client.configure.batch()
         
@@ -484,11 +958,16 @@ async def api_configure_batch(operations: List[Dict[str, Any]], client: VyOSClie
             path = operation.get("path")
             
             if not op or not path:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"success": False, "error": "Each operation must have 'op' and 'path' fields"}
                 )
             
+            # Invalidate the caches this operation can affect
+            path_parts = path if isinstance(path, list) else path.split()
+            invalidate_config_write(op, path_parts)
+            applied.append((op, path_parts))
+            
             if op == "set":
                 batch.set(path)
             elif op == "delete":
@@ -496,26 +975,33 @@ async def api_configure_batch(operations: List[Dict[str, Any]], client: VyOSClie
             elif op == "comment":
                 batch.comment(path)
             else:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"success": False, "error": f"Unknown operation: {op}"}
                 )
         
         result = await batch.execute()
-        return JSONResponse(content=result)
+        succeeded = result_outcome(result)
+        for op, path_parts in applied:
+            apply_config_write(op, path_parts, succeeded)
+        return FastJSONResponse(content=result)
         
     except VyOSAPIError as e:
-        return JSONResponse(
+        for op, path_parts in applied:
+            apply_config_write(op, path_parts, None)
+        return FastJSONResponse(
             status_code=500,
             content={"success": False, "error": f"VyOS API Error: {e.message}"}
         )
     except Exception as e:
+        for op, path_parts in applied:
+            apply_config_write(op, path_parts, None)
         error_response = {"success": False, "error": str(e)}
         
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
             
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # Generic operation routes
 @api_router.post("/generate/{path:path}")
@@ -538,24 +1024,24 @@ async def api_image_add(url: str, client: VyOSClient = Depends(get_vyos_client))
     """Handle 'image add' operations"""
     try:
         result = await client.image.add(url)
-        return JSONResponse(content=result)
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 @api_router.post("/image/delete")
 async def api_image_delete(name: str, client: VyOSClient = Depends(get_vyos_client)):
     """Handle 'image delete' operations"""
     try:
         result = await client.image.delete(name)
-        return JSONResponse(content=result)
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # Config file operations
 @api_router.post("/config-file/save")
@@ -567,12 +1053,20 @@ async def api_config_file_save(file: Optional[str] = None, client: VyOSClient =
         # Invalidate configuration cache after saving
         invalidate_cache(pattern="config")
         
-        return JSONResponse(content=result)
+        # Remember the saved config for /api/config/diff
+        if not file or file == DEFAULT_CONFIG_FILE:
+            try:
+                store_config_snapshot(SAVED_CONFIG, await running_config_snapshot())
+            except Exception as e:
+                logger.warning("Failed to snapshot the saved config: %s", e)
+                delete_config_snapshot(SAVED_CONFIG)
+        
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 @api_router.post("/config-file/load")
 async def api_config_file_load(file: str, client: VyOSClient = Depends(get_vyos_client)):
@@ -583,12 +1077,12 @@ async def api_config_file_load(file: str, client: VyOSClient = Depends(get_vyos_
         # Invalidate all caches after loading configuration
         invalidate_cache()
         
-        return JSONResponse(content=result)
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # System operations
 @api_router.post("/reboot")
@@ -596,24 +1090,24 @@ async def api_reboot(client: VyOSClient = Depends(get_vyos_client)):
     """Handle 'reboot' operations"""
     try:
         result = await client.reboot()
-        return JSONResponse(content=result)
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 @api_router.post("/poweroff")
 async def api_poweroff(client: VyOSClient = Depends(get_vyos_client)):
     """Handle 'poweroff' operations"""
     try:
         result = await client.poweroff()
-        return JSONResponse(content=result)
+        return FastJSONResponse(content=result)
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # DHCP leases parsing
 @lru_cache(maxsize=16)
@@ -693,7 +1187,7 @@ def parse_dhcp_leases(leases_string: str) -> Dict[str, List[Dict[str, str]]]:
 
 # DHCP leases API
 @api_router.get("/dhcp/leases")
-@cached(ttl=300, key_prefix="dhcp_leases")
+@cached(ttl=300, key_prefix="dhcp_leases", key_func=fixed_cache_key, stale_ttl=CACHE_STALE_TTL, stale_if_error=CACHE_STALE_IF_ERROR)
 async def api_dhcp_leases(client: VyOSClient = Depends(get_vyos_client)):
     """Get DHCP server leases information"""
     try:
@@ -701,13 +1195,13 @@ async def api_dhcp_leases(client: VyOSClient = Depends(get_vyos_client)):
         
         if result.get("success", False) and result.get("data"):
             leases_data = parse_dhcp_leases(result["data"])
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": True,
                 "leases": leases_data,
                 "error": None
             })
         
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={
                 "success": result.get("success", False),
@@ -717,7 +1211,7 @@ async def api_dhcp_leases(client: VyOSClient = Depends(get_vyos_client)):
         )
             
     except VyOSAPIError as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"success": False, "error": f"VyOS API Error: {e.message}"}
         )
@@ -725,11 +1219,11 @@ async def api_dhcp_leases(client: VyOSClient = Depends(get_vyos_client)):
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response)
+        return FastJSONResponse(status_code=500, content=error_response)
 
 # Routing table API
 @api_router.get("/routingtable")
-@cached(ttl=300, key_prefix="routing_table")
+@cached(ttl=300, key_prefix="routing_table", key_func=fixed_cache_key, stale_ttl=CACHE_STALE_TTL, stale_if_error=CACHE_STALE_IF_ERROR)
 async def api_routing_table(client: VyOSClient = Depends(get_vyos_client)):
     """Get routing table information from the VyOS router"""
     try:
@@ -745,13 +1239,13 @@ async def api_routing_table(client: VyOSClient = Depends(get_vyos_client)):
                     parts = [parts[0] + '}'] + ['{' + part + '}' for part in parts[1:-1]] + ['{' + parts[-1]]
                     routes_data = {}
                     for obj in parts:
-                        data = json.loads(obj)
+                        data = codec.loads(obj)
                         for prefix, routes in data.items():
                             for route in routes:
                                 vrf = route.get("vrfName", "default")
                                 routes_data.setdefault(vrf, {}).setdefault(prefix, []).append(route)  
                 else:
-                    routes_data = json.loads(result["data"].split('}{}')[0])
+                    routes_data = codec.loads(result["data"].split('}{}')[0])
 
                 routes_by_vrf = {}
                 total_routes = 0
@@ -815,16 +1309,16 @@ async def api_routing_table(client: VyOSClient = Depends(get_vyos_client)):
                     "timestamp": datetime.datetime.now().isoformat()
                 }
                 
-                return JSONResponse(content=response_data, media_type="application/json")
+                return FastJSONResponse(content=response_data, media_type="application/json")
                 
             except json.JSONDecodeError as e:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=500,
                     content={"success": False, "error": f"Failed to parse routing table data: {str(e)}"},
                     media_type="application/json"
                 )
         
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={
                 "success": result.get("success", False),
@@ -835,7 +1329,7 @@ async def api_routing_table(client: VyOSClient = Depends(get_vyos_client)):
         )
             
     except VyOSAPIError as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"success": False, "error": f"VyOS API Error: {e.message}"},
             media_type="application/json"
@@ -844,7 +1338,7 @@ async def api_routing_table(client: VyOSClient = Depends(get_vyos_client)):
         error_response = {"success": False, "error": str(e)}
         if not IS_PRODUCTION:
             error_response["traceback"] = traceback.format_exc()
-        return JSONResponse(status_code=500, content=error_response, media_type="application/json")
+        return FastJSONResponse(status_code=500, content=error_response, media_type="application/json")
 
 # GraphQL API
 @api_router.post("/graphql")
@@ -874,9 +1368,40 @@ async def legacy_dhcpleases_redirect():
 @api_router.get("/cache/stats")
 async def api_cache_stats():
     """Get cache statistics"""
-    return JSONResponse(content={
+    return FastJSONResponse(content={
         "success": True,
         "stats": cache.stats(),
+        "config_mirror": config_mirror.stats() if config_mirror else None,
+        "error": None
+    })
+
+@api_router.get("/health")
+async def api_health():
+    """Report backend health and whether the VyOS router is currently reachable"""
+    if not vyos_client:
+        return FastJSONResponse(
+            status_code=503,
+            content={"success": False, "status": "unconfigured", "error": "VyOS client not initialized. Check your environment variables."}
+        )
+    
+    breaker = vyos_client.breaker.stats()
+    status = {"closed": "ok", "half_open": "degraded", "open": "unavailable"}[breaker["state"]]
+    return FastJSONResponse(
+        status_code=503 if status == "unavailable" else 200,
+        content={
+            "success": status != "unavailable",
+            "status": status,
+            "circuit_breaker": breaker,
+            "error": None if status != "unavailable" else f"VyOS router at {VYOS_HOST} is unavailable"
+        }
+    )
+
+@api_router.get("/client/stats")
+async def api_client_stats(client: VyOSClient = Depends(get_vyos_client)):
+    """Get VyOS client statistics (request scheduling, coalescing and batching)"""
+    return FastJSONResponse(content={
+        "success": True,
+        "stats": client.stats(),
         "error": None
     })
 
@@ -885,12 +1410,12 @@ async def api_cache_clear(pattern: Optional[str] = None):
     """Clear the cache"""
     if pattern:
         count = cache.delete_pattern(pattern)
-        message = f"Cleared {count} cache entries matching pattern: {pattern}"
+        message = f"Cleared {count} cache entries under prefix: {pattern}"
     else:
         cache.clear()
         message = "Cache cleared completely"
     
-    return JSONResponse(content={
+    return FastJSONResponse(content={
         "success": True,
         "message": message,
         "error": None
@@ -899,11 +1424,46 @@ async def api_cache_clear(pattern: Optional[str] = None):
 # Include API router
 app.include_router(api_router)
 
+# Background tasks delivering other workers' cache invalidations and removing expired entries
+invalidation_watcher: Optional[asyncio.Task] = None
+cache_sweeper: Optional[asyncio.Task] = None
+config_mirror_refresher: Optional[asyncio.Task] = None
+
 # Startup event to run connection test
 @app.on_event("startup")
 async def startup_event():
+    global invalidation_watcher, cache_sweeper, config_mirror_refresher
+    if CACHE_SNAPSHOT_PATH and not cache.backend.shared:
+        try:
+            cache.load_snapshot(CACHE_SNAPSHOT_PATH)
+        except OSError as e:
+            logger.warning("Failed to load cache snapshot: %s", e)
     if vyos_client:
+        await vyos_client.start()
         asyncio.create_task(test_connection())
+    if cache.backend.shared:
+        invalidation_watcher = asyncio.create_task(cache.watch_invalidations(CACHE_INVALIDATION_POLL_MS / 1000))
+    if CACHE_SWEEP_INTERVAL > 0:
+        cache_sweeper = asyncio.create_task(cache.run_sweeper(CACHE_SWEEP_INTERVAL))
+    if config_mirror and CONFIG_MIRROR_REFRESH_INTERVAL > 0:
+        config_mirror_refresher = asyncio.create_task(config_mirror.run())
+
+# Shutdown event to release pooled router connections
+@app.on_event("shutdown")
+async def shutdown_event():
+    if invalidation_watcher:
+        invalidation_watcher.cancel()
+    if cache_sweeper:
+        cache_sweeper.cancel()
+    if config_mirror_refresher:
+        config_mirror_refresher.cancel()
+    if CACHE_SNAPSHOT_PATH and not cache.backend.shared:
+        try:
+            cache.save_snapshot(CACHE_SNAPSHOT_PATH)
+        except OSError as e:
+            logger.warning("Failed to save cache snapshot: %s", e)
+    if vyos_client:
+        await vyos_client.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -928,11 +1488,34 @@ async def dashboard(request: Request):
         "uptime": f"{uptime_minutes} minutes"
     }
     
+    def format_ms(value):
+        if value is None:
+            return "-"
+        return f"{value:.1f} ms"
+    
+    prefix_rows = [
+        {
+            "prefix": prefix,
+            "items": prefix_stats["items"],
+            "size": f"{prefix_stats['bytes'] / 1024:.1f} KiB",
+            "hits": prefix_stats["hits"],
+            "misses": prefix_stats["misses"],
+            "hit_rate": f"{round(prefix_stats['hit_rate'] * 100, 2)}%",
+            "evictions": prefix_stats["evictions"],
+            "hit_avg": format_ms(prefix_stats["hit_latency"]["avg_ms"]),
+            "miss_avg": format_ms(prefix_stats["miss_latency"]["avg_ms"]),
+            "miss_p95": format_ms(prefix_stats["miss_latency"]["p95_ms"]),
+            "fetch_avg": format_ms(prefix_stats["fetch_latency"]["avg_ms"])
+        }
+        for prefix, prefix_stats in cache_stats["prefixes"].items()
+    ]
+    
     return templates.TemplateResponse(
         "dashboard.html", 
         {
             "request": request, 
             "cache_data": cache_data,
+            "prefix_rows": prefix_rows,
             "app_version": "1.0.0",
             "vyos_host": VYOS_HOST,
             "is_production": IS_PRODUCTION
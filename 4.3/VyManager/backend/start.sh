@@ -25,6 +25,12 @@ LOG_LEVEL=${LOG_LEVEL:-info}
 ENVIRONMENT=${ENVIRONMENT:-development}
 BACKEND_LOG=${BACKEND_LOG:-backend.log}
 
+# Workers only share cached data and invalidations through the shared cache backend
+if [ "$WORKERS" -gt 1 ] && [ -z "$CACHE_BACKEND" ]; then
+    CACHE_BACKEND=sqlite
+    export CACHE_BACKEND
+fi
+
 # Check if python is installed and version is 3.8 or higher
 python_version=$(python --version | grep -oP '\d+\.\d+')
 python_major_version=$(echo "$python_version" | cut -d '.' -f 1)
@@ -45,11 +51,15 @@ log "Starting VyManager in $ENVIRONMENT mode..."
 log "Host: $HOST"
 log "Backend Port: $BACKEND_PORT"
 log "Workers: $WORKERS"
+log "Cache Backend: ${CACHE_BACKEND:-memory}"
 log "Log Level: $LOG_LEVEL"
 log "=============================================================="
 
+# The application writes its own logs to $BACKEND_LOG, so uvicorn output is not piped through tee
+export LOG_LEVEL BACKEND_LOG
+
 if [ "$ENVIRONMENT" = "production" ]; then
-  python -m uvicorn main:app --host $HOST --port $BACKEND_PORT --workers $WORKERS --log-level $LOG_LEVEL 2>&1 | tee -a $BACKEND_LOG
+  exec python -m uvicorn main:app --host $HOST --port $BACKEND_PORT --workers $WORKERS --log-level $LOG_LEVEL
 else
-  python -m uvicorn main:app --host $HOST --port $BACKEND_PORT --reload --log-level $LOG_LEVEL 2>&1 | tee -a $BACKEND_LOG
+  exec python -m uvicorn main:app --host $HOST --port $BACKEND_PORT --reload --log-level $LOG_LEVEL
 fi
\ No newline at end of file
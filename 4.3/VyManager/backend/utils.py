@@ -1,11 +1,25 @@
 import httpx
-import json
-from typing import List, Dict, Any, Union, Optional
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import time
+from typing import List, Dict, Any, Union, Optional, Callable, Awaitable, Hashable
 import ipaddress
+import logging
+import codec
+
+try:
+    import ijson
+except ImportError:  # Optional, enables incremental decoding of very large responses
+    ijson = None
+
+logger = logging.getLogger(__name__)
 
 def merge_cidr_parts(parts):
     if len(parts) > 5000:
-        print("CIDR merging failed: Input too large, skipping merge.")
+        logger.warning("CIDR merging failed: Input too large, skipping merge.")
         return parts
 
     merged = []
@@ -84,45 +98,352 @@ class PathBuilder:
         return self._path
 
 
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+    
+    The first caller for a key starts the call; callers arriving while it is
+    still in flight await the same result instead of starting their own.
+    """
+    
+    def __init__(self):
+        """Initialize a new SingleFlight group."""
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Run func once for all concurrent callers using the same key.
+        
+        The call runs in its own task, so a cancelled caller does not cancel
+        the call for the others.
+        
+        Args:
+            key: Key identifying identical calls
+            func: Zero-argument coroutine function performing the call
+            timeout: Seconds after which the call is cancelled and every caller
+                gets asyncio.TimeoutError (default: no limit)
+            
+        Returns:
+            The shared result of func
+        """
+        task = self._calls.get(key)
+        if task is None:
+            call = func() if timeout is None else asyncio.wait_for(func(), timeout)
+            task = asyncio.ensure_future(call)
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        """Drop a finished call so the next caller starts a fresh one."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    def in_flight(self) -> int:
+        """
+        Get the number of calls currently in flight.
+        
+        Returns:
+            Number of distinct keys being executed
+        """
+        return len(self._calls)
+
+
+# Request priority classes, lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_READ = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_READ: "read",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class RequestScheduler:
+    """
+    Bounded scheduler limiting concurrent requests to one router.
+    
+    At most max_concurrency requests run at once. When all slots are busy,
+    waiters are admitted by priority class (interactive, then read, then
+    background) and in arrival order within a class.
+    """
+    
+    def __init__(self, max_concurrency: int = 4):
+        """
+        Initialize a new RequestScheduler.
+        
+        Args:
+            max_concurrency: Maximum number of concurrent requests (default: 4)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        self._waiters: List[Any] = []
+        self._sequence = itertools.count()
+        self._lanes = {
+            priority: {"queued": 0, "admitted": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for priority in PRIORITY_NAMES
+        }
+    
+    async def acquire(self, priority: int = PRIORITY_READ) -> None:
+        """
+        Wait for a free request slot.
+        
+        Args:
+            priority: Priority class of the request (default: PRIORITY_READ)
+        """
+        lane = self._lanes[priority]
+        start = time.monotonic()
+        
+        # Waiters only exist while every slot is busy, so a free slot can be taken directly
+        if self._active < self.max_concurrency:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            lane["queued"] += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                # The slot may have been handed over just as we were cancelled
+                if future.done() and not future.cancelled():
+                    self.release()
+                raise
+            finally:
+                lane["queued"] -= 1
+        
+        waited = time.monotonic() - start
+        lane["admitted"] += 1
+        lane["wait_total"] += waited
+        lane["wait_max"] = max(lane["wait_max"], waited)
+    
+    def release(self) -> None:
+        """Release a request slot, handing it to the highest-priority waiter."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_READ):
+        """
+        Hold a request slot for the duration of a block.
+        
+        Args:
+            priority: Priority class of the request (default: PRIORITY_READ)
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler statistics.
+        
+        Returns:
+            Dictionary with active requests, queue depth and wait times per priority class
+        """
+        lanes = {}
+        for priority, lane in self._lanes.items():
+            admitted = lane["admitted"]
+            lanes[PRIORITY_NAMES[priority]] = {
+                "queued": lane["queued"],
+                "admitted": admitted,
+                "avg_wait": lane["wait_total"] / admitted if admitted else 0,
+                "max_wait": lane["wait_max"],
+            }
+        
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": sum(lane["queued"] for lane in self._lanes.values()),
+            "lanes": lanes,
+        }
+
+
+# Operations that are safe to retry because they do not change router state
+IDEMPOTENT_OPERATIONS = {"showConfig", "exists", "returnValues", "show"}
+
+# "outcome" of a failure result when the router may have applied the request anyway
+OUTCOME_UNKNOWN = "unknown"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that fails fast while the router is unhealthy.
+    
+    After failure_threshold consecutive failures the circuit opens and
+    requests are rejected without contacting the router. Once reset_timeout
+    has passed, a single probe request is let through (half-open); its
+    outcome closes or re-opens the circuit.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize a new CircuitBreaker.
+        
+        Args:
+            failure_threshold: Consecutive failures before the circuit opens (default: 5)
+            reset_timeout: Seconds to stay open before probing again (default: 30)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+    
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent to the router.
+        
+        Returns:
+            True if the request may proceed, False if it should fail fast
+        """
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        
+        self.rejected += 1
+        return False
+    
+    def record_success(self) -> None:
+        """Record a request that reached a responsive router."""
+        self._failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+    
+    def record_failure(self) -> None:
+        """Record a request that failed because the router was unreachable or unhealthy."""
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+    
+    def retry_after(self) -> float:
+        """
+        Get the number of seconds until the next probe is allowed.
+        
+        Returns:
+            Seconds remaining while open, otherwise 0
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker statistics.
+        
+        Returns:
+            Dictionary with the breaker state and counters
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "retry_after": self.retry_after(),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+def _should_stream_decode(response, client) -> bool:
+    """
+    Decide whether a response body should be decoded incrementally.
+    
+    Only successful responses are streamed, and only when ijson is installed
+    and the body is larger than the client's threshold (or of unknown size).
+    
+    Args:
+        response: The aiohttp response
+        client: The VyOSClient instance
+        
+    Returns:
+        True to decode the body incrementally
+    """
+    if ijson is None or not client.stream_threshold or response.status >= 400:
+        return False
+    length = response.content_length
+    return length is None or length > client.stream_threshold
+
+
+async def _decode_json_stream(response) -> Any:
+    """
+    Decode a JSON response body incrementally from the network stream.
+    
+    The raw body is never held in memory as a whole; only the parsed object is.
+    
+    Args:
+        response: The aiohttp response
+        
+    Returns:
+        The decoded JSON document
+    """
+    async for document in ijson.items(response.content, "", use_float=True):
+        return document
+    raise ValueError("Empty response body")
+
+
 async def make_api_request(
     url: str,
     data: str,
     client,
+    op: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Make a request to the VyOS API.
     
+    Idempotent reads are retried with jittered exponential backoff on
+    connection errors, timeouts and 5xx responses. Every request is gated by
+    the client's circuit breaker.
+    
     Args:
         url: The API endpoint URL
         data: The JSON data to send in the request
         client: The VyOSClient instance
+        op: The operation being performed, used to pick the timeout and retry policy
         
     Returns:
-        The API response as a dictionary
+        The API response as a dictionary. Failures where the router may
+        still have applied the request carry "outcome": OUTCOME_UNKNOWN.
     """
     import aiohttp
-    import json
-    import ssl
-    import time
+    import random
     
     start_time = time.time()
-    print(f"Making API request to: {url}")
-    print(f"Request data: {data}")
-    
-    # Setup SSL context if using HTTPS
-    ssl_context = None
-    if client.https:
-        if client.trust_self_signed:
-            print("Using SSL with self-signed certificate validation disabled")
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-        elif client.cert_path:
-            print(f"Using SSL with certificate from: {client.cert_path}")
-            ssl_context = ssl.create_default_context(cafile=client.cert_path)
-        else:
-            print("Using default SSL context")
-            ssl_context = ssl.create_default_context()
+    logger.debug("Making API request", extra={"url": url, "payload": data})
     
     # Prepare the form data
     form_data = {
@@ -130,82 +451,140 @@ async def make_api_request(
         'key': (None, client.api_key)
     }
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            print(f"Sending request to {url}...")
-            try:
-                async with session.post(
-                    url,
-                    data=form_data,
-                    ssl=ssl_context,
-                    timeout=30.0
-                ) as response:
-                    elapsed_time = time.time() - start_time
-                    print(f"Response received in {elapsed_time:.2f}s with status: {response.status}")
-                    
-                    # Log the response
-                    response_text = await response.text()
-                    print(f"Response text length: {len(response_text)} chars")
-                    print(f"Response text preview: {response_text[:1000] if len(response_text) > 1000 else response_text}")
-                    
+    timeout_seconds = client.timeouts.get(op, client.request_timeout)
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    attempts = 1 + (client.max_retries if op in IDEMPOTENT_OPERATIONS else 0)
+    breaker = client.breaker
+    
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow_request():
+            logger.warning("Circuit breaker open, not contacting VyOS router at %s", client.host)
+            return {
+                "success": False,
+                "error": f"VyOS router at {client.host} is unavailable (circuit breaker open). Retrying in {breaker.retry_after():.0f}s."
+            }
+        
+        # Set by a transient failure: a result dict to return or an exception to raise
+        failure: Union[Dict[str, Any], Exception, None] = None
+        # A half-open probe must settle the breaker however it ends, or the
+        # breaker rejects every later request while the probe stays in flight
+        probe = breaker.state == CircuitBreaker.HALF_OPEN
+        settled = False
+        
+        try:
+            session = await client.get_session()
+            async with session.post(
+                url,
+                data=form_data,
+                timeout=timeout
+            ) as response:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Response received",
+                        extra={"url": url, "status": response.status, "elapsed": round(time.time() - start_time, 3)}
+                    )
+                
+                # Decode straight from bytes, or incrementally for very large bodies
+                body = b""
+                try:
+                    if _should_stream_decode(response, client):
+                        response_data = await _decode_json_stream(response)
+                    else:
+                        body = await response.read()
+                        if client.debug_responses and logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                "Response body preview: %s", body[:1000].decode("utf-8", errors="replace"),
+                                extra={"url": url, "bytes": len(body)}
+                            )
+                        response_data = codec.loads(body)
+                except (ValueError, getattr(ijson, "JSONError", ValueError)) as e:
                     # Handle non-JSON responses
-                    try:
-                        response_data = json.loads(response_text)
-                    except json.JSONDecodeError as e:
-                        print(f"Failed to parse JSON response: {e}")
-                        return {
-                            "success": False,
-                            "error": f"Invalid JSON response from VyOS router: {str(e)}",
-                            "raw_data": response_text[:1000] if len(response_text) > 1000 else response_text
-                        }
-                    
-                    # Check for API error
-                    if response.status >= 400:
-                        error_msg = response_data.get("error", "Unknown error")
-                        print(f"API error (HTTP {response.status}): {error_msg}")
-                        raise VyOSAPIError(
-                            message=f"HTTP Error {response.status}: {error_msg}",
-                            status_code=response.status,
-                            response=response
-                        )
+                    logger.error("Failed to parse JSON response from %s: %s", url, e)
+                    response_data = None
+                    failure = {
+                        "success": False,
+                        "error": f"Invalid JSON response from VyOS router: {str(e)}",
+                        "raw_data": body[:1000].decode("utf-8", errors="replace"),
+                        "outcome": OUTCOME_UNKNOWN
+                    }
+                
+                # Check for API error
+                if response.status >= 400:
+                    error_msg = response_data.get("error", "Unknown error") if isinstance(response_data, dict) else "Unknown error"
+                    logger.warning("API error (HTTP %s): %s", response.status, error_msg)
+                    failure = VyOSAPIError(
+                        message=f"HTTP Error {response.status}: {error_msg}",
+                        status_code=response.status,
+                        response=response
+                    )
+                
+                if response.status < 500:
+                    # The router answered, so it is healthy even if the request was rejected
+                    breaker.record_success()
+                    settled = True
+                    if isinstance(failure, Exception):
+                        raise failure
+                    if failure is not None:
+                        return failure
                     
                     # Check for error in response data
                     if response_data.get("success") is False and response_data.get("error"):
                         error_msg = response_data["error"]
-                        print(f"API error in response data: {error_msg}")
+                        logger.info("API error in response data: %s", error_msg)
                         # We don't raise an exception here because the API returned a valid response
                         # with a structured error. The caller can handle this appropriately.
                     
                     return response_data
-            except aiohttp.ClientConnectorError as e:
-                print(f"Connection error: Could not connect to VyOS router at {url}: {e}")
-                return {
-                    "success": False,
-                    "error": f"Connection error: Could not connect to VyOS router at {client.host}. Please check that the VyOS router is accessible and API service is enabled."
-                }
-            except aiohttp.ClientSSLError as e:
-                print(f"SSL error connecting to VyOS router: {e}")
-                return {
-                    "success": False,
-                    "error": f"SSL error: Connection failed due to SSL certificate issues. If using self-signed certificates, make sure TRUST_SELF_SIGNED is set to true."
-                }
-            except aiohttp.ClientResponseError as e:
-                print(f"VyOS API response error: {e}")
-                return {
-                    "success": False,
-                    "error": f"API response error: {str(e)}"
-                }
-            except aiohttp.ClientError as e:
-                print(f"Client error: {str(e)}")
-                raise VyOSAPIError(f"Connection error: {str(e)}")
-    except VyOSAPIError:
-        # Just re-raise VyOSAPIError without wrapping it
-        raise
-    except Exception as e:
-        print(f"Unexpected error in make_api_request: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        raise VyOSAPIError(f"Unexpected error when communicating with VyOS router: {str(e)}")
+        except aiohttp.ClientSSLError as e:
+            logger.error("SSL error connecting to VyOS router: %s", e)
+            breaker.record_failure()
+            settled = True
+            return {
+                "success": False,
+                "error": f"SSL error: Connection failed due to SSL certificate issues. If using self-signed certificates, make sure TRUST_SELF_SIGNED is set to true."
+            }
+        except aiohttp.ClientConnectorError as e:
+            logger.error("Connection error: Could not connect to VyOS router at %s: %s", url, e)
+            failure = {
+                "success": False,
+                "error": f"Connection error: Could not connect to VyOS router at {client.host}. Please check that the VyOS router is accessible and API service is enabled."
+            }
+        except aiohttp.ClientResponseError as e:
+            logger.error("VyOS API response error: %s", e)
+            return {
+                "success": False,
+                "error": f"API response error: {str(e)}",
+                "outcome": OUTCOME_UNKNOWN
+            }
+        except asyncio.TimeoutError:
+            logger.error("Request to %s timed out after %ss", url, timeout_seconds)
+            failure = VyOSAPIError(f"Timed out after {timeout_seconds}s waiting for VyOS router at {client.host}")
+        except aiohttp.ClientError as e:
+            logger.error("Client error: %s", e)
+            failure = VyOSAPIError(f"Connection error: {str(e)}")
+        except VyOSAPIError:
+            # Just re-raise VyOSAPIError without wrapping it
+            raise
+        except Exception as e:
+            logger.exception("Unexpected error in make_api_request: %s", e)
+            raise VyOSAPIError(f"Unexpected error when communicating with VyOS router: {str(e)}")
+        finally:
+            # Transient failures are recorded below; any other unsettled exit
+            # (unexpected errors, cancellation) fails the probe
+            if probe and not settled and failure is None:
+                breaker.record_failure()
+        
+        # Transient failure: the router is unreachable, too slow or returned 5xx
+        breaker.record_failure()
+        if attempt < attempts and breaker.state == CircuitBreaker.CLOSED:
+            delay = random.uniform(0, client.retry_backoff * (2 ** (attempt - 1)))
+            logger.info("Retrying %s request in %.2fs (attempt %d/%d)", op, delay, attempt + 1, attempts)
+            await asyncio.sleep(delay)
+            continue
+        
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
 
 
 class VyOSAPIError(Exception):